@@ -0,0 +1,137 @@
+import numpy as np
+from pathlib import Path
+
+
+def top_k_indices(scores, top_k):
+    """Indices of the top_k highest scores, best first, without a full sort."""
+    n = scores.shape[0]
+    if top_k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if top_k >= n:
+        return np.argsort(scores)[::-1]
+    part = np.argpartition(scores, n - top_k)[n - top_k:]
+    return part[np.argsort(scores[part])[::-1]]
+
+
+def top_k_rows(scores, top_k):
+    """Row-wise top_k_indices for a (queries, rows) score matrix, best first."""
+    n = scores.shape[1]
+    if top_k >= n:
+        return np.argsort(scores, axis=1)[:, ::-1]
+    part = np.argpartition(scores, n - top_k, axis=1)[:, n - top_k:]
+    order = np.argsort(np.take_along_axis(scores, part, axis=1), axis=1)[:, ::-1]
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _assign(vectors, centroids, chunk=65536):
+    """Nearest centroid (by dot product) for every row, in chunks to bound memory."""
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], chunk):
+        block = vectors[start:start + chunk]
+        labels[start:start + chunk] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(vectors, nlist, iterations=10, sample_size=None, seed=0):
+    """
+    K-means on unit vectors using cosine similarity.
+    Trains on a random sample (default 256 points per centroid) and returns
+    unit-normalized float32 centroids.
+    """
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample_size = sample_size or nlist * 256
+
+    if n > sample_size:
+        sample = vectors[rng.choice(n, sample_size, replace=False)]
+    else:
+        sample = vectors
+
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+
+        # Sum members per cluster with one reduceat over label-sorted rows.
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over a unit-normalized embedding matrix.
+
+    Vectors are bucketed by their nearest k-means centroid. A query scores the
+    centroids, then only the rows in the `nprobe` closest buckets. Rows appended
+    to the matrix after the index was built (index.size onwards) are always
+    scanned exactly, so the index never hides new documents.
+    """
+
+    def __init__(self, centroids, order, offsets, size):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.size = int(size)
+
+    @property
+    def nlist(self):
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, embeddings, nlist=None, iterations=10, seed=0):
+        n = embeddings.shape[0]
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        centroids = spherical_kmeans(embeddings, nlist, iterations=iterations, seed=seed)
+        labels = _assign(embeddings, centroids)
+
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        counts = np.bincount(labels, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(centroids, order, offsets, n)
+
+    def candidates(self, qv, nprobe):
+        probe = top_k_indices(self.centroids @ qv, min(nprobe, self.nlist))
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+    def search(self, embeddings, qv, top_k, nprobe):
+        """Return (indices, scores) of the approximate top_k rows of `embeddings` for `qv`."""
+        cand = self.candidates(qv, nprobe)
+
+        total = embeddings.shape[0]
+        if total > self.size:
+            cand = np.concatenate([cand, np.arange(self.size, total)])
+
+        if cand.shape[0] == 0:
+            return cand, np.zeros(0, dtype=np.float32)
+
+        scores = embeddings[cand] @ qv
+        best = top_k_indices(scores, min(top_k, cand.shape[0]))
+        return cand[best], scores[best]
+
+    def save(self, file):
+        np.savez(
+            file,
+            centroids=self.centroids,
+            order=self.order,
+            offsets=self.offsets,
+            size=np.array(self.size),
+        )
+
+    @classmethod
+    def load(cls, path: Path):
+        with np.load(path) as data:
+            return cls(data["centroids"], data["order"], data["offsets"], int(data["size"]))
@@ -4,7 +4,7 @@ from flask import Flask, request, jsonify, session, render_template
 
 
 
-from core import handle_chat_logic, parse_booking_slots
+from core import handle_chat_logic, parse_booking_slots, HOTEL_CONTEXT_CACHE
 
 
 from services_pms import (
@@ -12,6 +12,16 @@ from services_pms import (
     create_housekeeping_ticket,
     create_booking,
     pms_check_availability_pricing,
+    pms_flexible_search,
+    db_pool_stats,
+    invalidate_room_types,
+    start_room_type_refresh,
+    room_type_cache_stats,
+    invalidate_rates,
+    rate_calendar_stats,
+    soft_delete_customer,
+    invalidate_customer,
+    customer_cache_stats,
 )
 
 
@@ -20,8 +30,11 @@ from services_rag import (
     CUSTOMER_STORE,
     BOOKING_STORE,
     ROOM_TYPE_STORE,
-    build_all_rag,
+    HOTEL_INFO_STORE,
+    sync_all_rag,
+    embed_cache_stats,
 )
+from rag_jobs import SYNC_JOBS
 
 from config import FLASK_SECRET_KEY
 
@@ -84,6 +97,31 @@ def api_create_customer():
     return jsonify({"status": "ok", "customer_id": cid})
 
 
+@app.route("/delete_customer", methods=["POST"])
+def api_delete_customer():
+    customer_id = request.json.get("customer_id")
+    if not customer_id:
+        return jsonify({"status": "error", "message": "customer_id is required"}), 400
+
+    deleted = soft_delete_customer(customer_id)
+    if deleted is None:
+        return jsonify({"status": "error", "message": "Failed to delete customer"}), 500
+    if not deleted:
+        return jsonify({"status": "error", "message": "Customer not found"}), 404
+
+    return jsonify({"status": "ok"})
+
+
+@app.route("/customers/invalidate", methods=["POST"])
+def api_invalidate_customer():
+    # Hook for the PMS after it soft-deletes a customer or changes an email itself.
+    customer_id = request.json.get("customer_id")
+    if not customer_id:
+        return jsonify({"status": "error", "message": "customer_id is required"}), 400
+    invalidate_customer(customer_id)
+    return jsonify({"status": "ok"})
+
+
 @app.route("/create_housekeeping_ticket", methods=["POST"])
 def api_create_housekeeping():
     data = request.json
@@ -96,24 +134,102 @@ def api_create_housekeeping():
     return jsonify({"status": "ok", "ticket": ticket})
 
 
+@app.route("/flexible_search", methods=["POST"])
+def api_flexible_search():
+    data = request.json
+    try:
+        nights = int(data.get("nights", 1))
+        guests = int(data.get("guests", 1))
+        limit = int(data.get("limit", 5))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "nights, guests and limit must be numbers"}), 400
+    if nights <= 0 or guests <= 0 or limit <= 0:
+        return jsonify({"status": "error", "message": "nights, guests and limit must be positive"}), 400
+    sort = data.get("sort", "cheapest")
+    if sort not in ("cheapest", "earliest"):
+        return jsonify({"status": "error", "message": "sort must be 'cheapest' or 'earliest'"}), 400
+    if not data.get("window_start") or not data.get("window_end"):
+        return jsonify({"status": "error", "message": "window_start and window_end are required"}), 400
+
+    options = pms_flexible_search(
+        data.get("window_start"),
+        data.get("window_end"),
+        nights,
+        guests,
+        sort=sort,
+        limit=limit,
+    )
+    return jsonify({"status": "ok", "options": options})
+
+
 @app.route("/rag_sync", methods=["POST"])
 def api_rag_sync():
-    result = build_all_rag()
-    return jsonify({"status": "ok", "result": result})
+    mode = (request.get_json(silent=True) or {}).get("mode", "incremental")
+    try:
+        job, coalesced = SYNC_JOBS.submit(mode)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    # The sync runs in the background; poll /rag_status?job=<job_id> for progress.
+    return jsonify({"status": "ok", "job_id": job.id, "mode": job.mode, "coalesced": coalesced}), 202
+
+
+@app.route("/room_types/invalidate", methods=["POST"])
+def api_invalidate_room_types():
+    # Hook for the PMS (or an admin) after editing room types or inventory.
+    invalidate_room_types()
+    job, coalesced = SYNC_JOBS.submit("incremental")
+    return jsonify({"status": "ok", "job_id": job.id, "coalesced": coalesced}), 202
+
+
+@app.route("/rates/invalidate", methods=["POST"])
+def api_invalidate_rates():
+    # Hook for the PMS after editing rate plans; the next quote rebuilds the calendar.
+    invalidate_rates()
+    return jsonify({"status": "ok"})
+
+
+@app.route("/db_status", methods=["GET"])
+def api_db_status():
+    return jsonify({
+        "pool": db_pool_stats(),
+        "room_type_cache": room_type_cache_stats(),
+        "rate_calendar": rate_calendar_stats(),
+        "customer_cache": customer_cache_stats(),
+    })
 
 
 @app.route("/rag_status", methods=["GET"])
 def api_rag_status():
+    job_id = request.args.get("job")
+    job = SYNC_JOBS.get(job_id)
+    if job_id and job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+
     return jsonify({
-        "customers": len(CUSTOMER_STORE.metadata),
-        "bookings": len(BOOKING_STORE.metadata),
-        "room_types": len(ROOM_TYPE_STORE.metadata)
+        "customers": len(CUSTOMER_STORE),
+        "bookings": len(BOOKING_STORE),
+        "room_types": len(ROOM_TYPE_STORE),
+        "versions": {
+            "customers": CUSTOMER_STORE.version,
+            "bookings": BOOKING_STORE.version,
+            "room_types": ROOM_TYPE_STORE.version,
+            "hotel_info": HOTEL_INFO_STORE.version,
+        },
+        "shards": {
+            "customers": {"companies": CUSTOMER_STORE.counts, "loaded": CUSTOMER_STORE.loaded()},
+            "bookings": {"companies": BOOKING_STORE.counts, "loaded": BOOKING_STORE.loaded()},
+        },
+        "job": job.status() if job else None,
+        "embed_cache": embed_cache_stats(),
+        "hotel_context_cache": HOTEL_CONTEXT_CACHE.stats()
     })
 
 
 
 if __name__ == "__main__":
-    print("[STARTUP] Building RAG indexes...")
-    build_all_rag()
+    print("[STARTUP] Syncing RAG indexes...")
+    sync_all_rag()
+    start_room_type_refresh()
     print("[STARTUP] Nexrova AI backend ready.")
     app.run(host="0.0.0.0", port=5000, debug=True)
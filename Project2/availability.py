@@ -0,0 +1,167 @@
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# Stays ending further ahead than this are not indexed (and never reported free).
+MAX_HORIZON_DAYS = 3 * 366
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+class OccupancyIndex:
+    """
+    In-memory occupancy bitmap: one row per room, one column per night,
+    starting at `origin`. True means the room is taken that night.
+
+    Rooms are grouped by room type, so "free rooms of type T for
+    [check_in, check_out)" is a single `any` over a (rooms of T) x (nights)
+    slice. Nights before `origin` are treated as unavailable; the horizon
+    grows on demand when a later night is booked or queried, up to
+    MAX_HORIZON_DAYS.
+    """
+
+    def __init__(self, origin=None, horizon_days=400):
+        self.origin = to_date(origin or date.today())
+        self._lock = threading.RLock()
+        self.room_ids = np.zeros(0, dtype=np.int64)
+        self.room_types = np.zeros(0, dtype=np.int64)
+        self._row_of = {}
+        self._type_rows = {}
+        self._types = np.zeros(0, dtype=np.int64)
+        self._type_of_row = np.zeros(0, dtype=np.int64)
+        self.nights = np.zeros((0, horizon_days), dtype=bool)
+
+    @classmethod
+    def build(cls, rooms, stays, origin=None, horizon_days=400):
+        """rooms: [(room_id, room_type_id)]; stays: [(room_id, check_in, check_out)]."""
+        index = cls(origin, horizon_days)
+        index.set_rooms(rooms)
+        index.book_many(stays)
+        return index
+
+    def set_rooms(self, rooms):
+        with self._lock:
+            rooms = sorted((int(r), int(t)) for r, t in rooms)
+            self.room_ids = np.array([r for r, _ in rooms], dtype=np.int64)
+            self.room_types = np.array([t for _, t in rooms], dtype=np.int64)
+            self._row_of = {r: i for i, (r, _) in enumerate(rooms)}
+            self._type_rows = {}
+            for i, (_, t) in enumerate(rooms):
+                self._type_rows.setdefault(t, []).append(i)
+            self._type_rows = {t: np.array(rows, dtype=np.int64) for t, rows in self._type_rows.items()}
+            self._types, self._type_of_row = np.unique(self.room_types, return_inverse=True)
+            self.nights = np.zeros((len(rooms), self.nights.shape[1]), dtype=bool)
+
+    def __len__(self):
+        return len(self.room_ids)
+
+    def _span(self, check_in, check_out):
+        """Column range for [check_in, check_out), growing the horizon if needed; None if empty or out of range."""
+        start = (to_date(check_in) - self.origin).days
+        end = (to_date(check_out) - self.origin).days
+        if end <= start or end <= 0 or end > MAX_HORIZON_DAYS:
+            return None
+        if end > self.nights.shape[1]:
+            grown = np.zeros((self.nights.shape[0], max(end, self.nights.shape[1] * 2)), dtype=bool)
+            grown[:, :self.nights.shape[1]] = self.nights
+            self.nights = grown
+        return start, end
+
+    def book(self, room_id, check_in, check_out):
+        """Mark a stay; stays on unknown rooms are ignored. Returns False if the room was already taken."""
+        with self._lock:
+            row = self._row_of.get(int(room_id))
+            span = self._span(check_in, check_out)
+            if row is None or span is None:
+                return True
+            start, end = max(span[0], 0), span[1]
+            clash = bool(self.nights[row, start:end].any())
+            self.nights[row, start:end] = True
+            return not clash
+
+    def book_many(self, stays):
+        """Mark many stays at once (difference array + cumsum instead of one slice per stay)."""
+        rows, starts, ends = [], [], []
+        with self._lock:
+            for room_id, check_in, check_out in stays:
+                row = self._row_of.get(int(room_id))
+                span = self._span(check_in, check_out)
+                if row is not None and span is not None:
+                    rows.append(row)
+                    starts.append(max(span[0], 0))
+                    ends.append(span[1])
+            if not rows:
+                return
+
+            width = self.nights.shape[1]
+            diff = np.zeros((self.nights.shape[0], width + 1), dtype=np.int32)
+            np.add.at(diff, (rows, starts), 1)
+            np.add.at(diff, (rows, ends), -1)
+            self.nights |= np.cumsum(diff, axis=1)[:, :width] > 0
+
+    def release(self, room_id, check_in, check_out):
+        with self._lock:
+            row = self._row_of.get(int(room_id))
+            span = self._span(check_in, check_out)
+            if row is not None and span is not None:
+                self.nights[row, max(span[0], 0):span[1]] = False
+
+    def free_rooms(self, room_type_id, check_in, check_out):
+        """Room ids of `room_type_id` free for every night of [check_in, check_out)."""
+        with self._lock:
+            rows = self._type_rows.get(int(room_type_id))
+            span = self._span(check_in, check_out)
+            if rows is None or span is None or span[0] < 0:
+                return []
+            taken = self.nights[rows, span[0]:span[1]].any(axis=1)
+            return self.room_ids[rows[~taken]].tolist()
+
+    def is_free(self, room_id, check_in, check_out):
+        with self._lock:
+            row = self._row_of.get(int(room_id))
+            span = self._span(check_in, check_out)
+            if row is None or span is None or span[0] < 0:
+                return False
+            return not self.nights[row, span[0]:span[1]].any()
+
+    def free_counts(self, check_in, check_out):
+        """{room_type_id: number of rooms free for the whole stay}."""
+        with self._lock:
+            span = self._span(check_in, check_out)
+            if span is None or span[0] < 0 or len(self.room_ids) == 0:
+                return {}
+            free = ~self.nights[:, span[0]:span[1]].any(axis=1)
+            counts = np.bincount(self._type_of_row, weights=free, minlength=len(self._types))
+            return {int(t): int(c) for t, c in zip(self._types, counts)}
+
+    def free_counts_by_start(self, first_check_in, last_check_in, nights):
+        """
+        Rooms per type free for a `nights`-night stay starting on each date from
+        first_check_in to last_check_in (inclusive), in one pass: a running sum
+        of taken nights per room turns every stay window into one subtraction.
+
+        Returns (room_type_ids, counts) with counts shaped (types x start dates).
+        """
+        with self._lock:
+            empty = (self._types.copy(), np.zeros((len(self._types), 0), dtype=np.int64))
+            if nights <= 0 or len(self.room_ids) == 0:
+                return empty
+            span = self._span(first_check_in, to_date(last_check_in) + timedelta(days=nights))
+            if span is None or span[0] < 0 or span[1] - span[0] < nights:
+                return empty
+            start, end = span
+
+            taken = np.zeros((len(self.room_ids), end - start + 1), dtype=np.int32)
+            np.cumsum(self.nights[:, start:end], axis=1, out=taken[:, 1:])
+            free = (taken[:, nights:] - taken[:, :-nights]) == 0
+
+            onehot = np.zeros((len(self._types), len(self.room_ids)), dtype=np.int64)
+            onehot[self._type_of_row, np.arange(len(self.room_ids))] = 1
+            return self._types.copy(), onehot @ free.astype(np.int64)
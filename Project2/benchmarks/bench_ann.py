@@ -0,0 +1,56 @@
+"""
+Recall / latency benchmark for the IVF index against the exact scan.
+
+Builds a clustered synthetic corpus (real sentence embeddings are far from
+uniform, so a uniform random matrix would understate recall), then sweeps
+nprobe and reports recall@k and per-query latency.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_ann.py [rows] [queries]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_DIM
+from ann_index import IVFIndex, top_k_indices
+from services_rag import normalize_rows
+
+
+def clustered_corpus(rows, clusters=500, spread=0.35, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, EMBEDDING_DIM))
+    labels = rng.integers(0, clusters, rows)
+    data = centers[labels] + spread * rng.standard_normal((rows, EMBEDDING_DIM))
+    return normalize_rows(data)
+
+
+def run(rows=200_000, queries=200, top_k=10):
+    corpus = clustered_corpus(rows)
+    qs = normalize_rows(corpus[np.random.default_rng(1).choice(rows, queries)]
+                        + 0.1 * np.random.default_rng(2).standard_normal((queries, EMBEDDING_DIM)))
+
+    start = time.perf_counter()
+    index = IVFIndex.build(corpus)
+    print(f"built IVF over {rows} rows, nlist={index.nlist} in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    truth = [set(top_k_indices(corpus @ q, top_k)) for q in qs]
+    exact_ms = (time.perf_counter() - start) * 1000 / queries
+    print(f"exact          | {exact_ms:7.3f} ms/query | recall@{top_k} 1.000")
+
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        start = time.perf_counter()
+        found = [set(index.search(corpus, q, top_k, nprobe)[0]) for q in qs]
+        ms = (time.perf_counter() - start) * 1000 / queries
+        recall = np.mean([len(f & t) / top_k for f, t in zip(found, truth)])
+        print(f"ivf nprobe={nprobe:<3} | {ms:7.3f} ms/query | recall@{top_k} {recall:.3f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(*args)
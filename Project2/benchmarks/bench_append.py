@@ -0,0 +1,71 @@
+"""
+Time and memory for sequential VectorStore.add calls.
+
+Compares the old per-call np.vstack (copies the whole matrix on every append)
+with the capacity-doubling buffer. The vstack path is quadratic, so it is only
+run up to `legacy_max` rows and the rest is left out.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_append.py [rows] [legacy_max]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_DIM
+import services_rag
+from services_rag import VectorStore
+
+VECTORS = np.random.default_rng(0).standard_normal((1024, EMBEDDING_DIM)).astype(np.float32)
+
+
+def fake_embed(text):
+    # Isolate the append cost from the embedder.
+    return VECTORS[len(text) % len(VECTORS)]
+
+
+def legacy_append(rows):
+    embeddings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    for i in range(rows):
+        vector = fake_embed(str(i))
+        if embeddings.shape[0] == 0:
+            embeddings = np.array([vector])
+        else:
+            embeddings = np.vstack([embeddings, vector])
+    return embeddings
+
+
+def buffered_append(rows):
+    store = VectorStore("__bench_append__")
+    store.clear()
+    for i in range(rows):
+        store.add(str(i), str(i))
+    return store
+
+
+def measure(label, fn, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {rows:>8} appends | {elapsed:8.3f} s | {rows / elapsed:10.0f} adds/s | "
+          f"peak {peak / 2**20:8.1f} MB")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    rows = args[0] if args else 100_000
+    legacy_max = args[1] if len(args) > 1 else 10_000
+
+    services_rag.embed = fake_embed
+
+    measure("buffered", buffered_append, rows)
+    for n in sorted({min(rows, legacy_max) // 4, min(rows, legacy_max)}):
+        measure("vstack", legacy_append, n)
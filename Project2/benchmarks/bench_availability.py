@@ -0,0 +1,82 @@
+"""
+Free-room lookups on the in-memory occupancy index vs scanning the stays.
+
+A synthetic property (rooms spread over several room types) gets a year of
+random bookings at the target occupancy; the same [check_in, check_out)
+queries are answered by OccupancyIndex.free_rooms and by an overlap scan over
+every stay of the type, which is what a SQL query without an index does.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_availability.py [rooms] [room_types] [occupancy]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import OccupancyIndex
+
+
+def synthetic_year(rooms, room_types, occupancy, seed=0):
+    rng = random.Random(seed)
+    origin = date.today()
+    room_list = [(r, r % room_types + 1) for r in range(1, rooms + 1)]
+    stays = []
+    for room_id, _ in room_list:
+        night = rng.randint(0, 3)
+        while night < 365:
+            length = rng.randint(1, 7)
+            if rng.random() < occupancy:
+                stays.append((room_id, origin + timedelta(night), origin + timedelta(night + length)))
+            night += length
+    return origin, room_list, stays
+
+
+def scan_free(room_list, stays_by_type, room_type_id, check_in, check_out):
+    taken = {r for r, ci, co in stays_by_type.get(room_type_id, ()) if ci < check_out and check_in < co}
+    return [r for r, t in room_list if t == room_type_id and r not in taken]
+
+
+def run(rooms=200, room_types=8, occupancy=0.8, queries=5000):
+    origin, room_list, stays = synthetic_year(rooms, room_types, occupancy)
+    type_of = dict(room_list)
+    stays_by_type = {}
+    for stay in stays:
+        stays_by_type.setdefault(type_of[stay[0]], []).append(stay)
+
+    start = time.perf_counter()
+    index = OccupancyIndex.build(room_list, stays, origin=origin)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{rooms} rooms, {room_types} types, {len(stays)} stays over a year | index built in {build_ms:.1f} ms")
+
+    rng = random.Random(1)
+    asks = []
+    for _ in range(queries):
+        check_in = origin + timedelta(rng.randint(0, 358))
+        asks.append((rng.randint(1, room_types), check_in, check_in + timedelta(rng.randint(1, 7))))
+
+    start = time.perf_counter()
+    from_index = [index.free_rooms(t, ci, co) for t, ci, co in asks]
+    index_us = (time.perf_counter() - start) * 1e6 / queries
+
+    start = time.perf_counter()
+    from_scan = [scan_free(room_list, stays_by_type, t, ci, co) for t, ci, co in asks]
+    scan_us = (time.perf_counter() - start) * 1e6 / queries
+
+    start = time.perf_counter()
+    for _, ci, co in asks:
+        index.free_counts(ci, co)
+    counts_us = (time.perf_counter() - start) * 1e6 / queries
+
+    same = all(sorted(a) == sorted(b) for a, b in zip(from_index, from_scan))
+    print(f"free_rooms   {index_us:9.1f} us/query")
+    print(f"free_counts  {counts_us:9.1f} us/query (all types)")
+    print(f"stay scan    {scan_us:9.1f} us/query | same answers: {same}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(*(int(a) for a in args[:2]), *(float(a) for a in args[2:3]))
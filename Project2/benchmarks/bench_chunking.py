@@ -0,0 +1,105 @@
+"""
+Prompt size and retrieval quality of hotel_info as whole sections vs chunks.
+
+Both variants are indexed in memory (nothing is saved) and searched with
+top_k=3 in the store's default mode. The chunked store is also run through
+core.get_hotel_context, which adds neighbouring chunks within
+HOTEL_INFO_CONTEXT_TOKENS: that is the context a chat prompt actually gets.
+A query counts as answered when the expected fact appears in the context.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_chunking.py [max_tokens] [overlap]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import HOTEL_INFO_CHUNK_TOKENS, HOTEL_INFO_CHUNK_OVERLAP
+from chunker import chunk_document, count_tokens, split_sections
+import core
+import services_rag
+from services_rag import VectorStore
+
+# (guest question, text the answer must contain)
+QUERIES = [
+    ("What time is check-out?", "Check-out Time: 11:00"),
+    ("What is the wifi password?", "WiFi Password"),
+    ("Is breakfast included?", "complimentary South Indian breakfast"),
+    ("Do you allow pets?", "pets are not allowed"),
+    ("How much is an extra bed?", "extra bed available at ₹500"),
+    ("How far is the nearest metro?", "800 meters"),
+    ("Is there a gym?", "Gold's Gym"),
+    ("I lost my room key", "Replacement key"),
+    ("Is parking free?", "Free covered and open parking"),
+    ("How much is the suite per night?", "Suite (2 rooms): ₹6,000"),
+    ("What is your phone number?", "+91-9876543210"),
+    ("What is the cancellation policy?", "Free cancellation up to 24 hours"),
+    ("Can I smoke in the room?", "Smoking: Strictly prohibited"),
+    ("How much is laundry?", "₹50 per kg"),
+    ("Do you offer airport pickup?", "Airport Pickup: Available at ₹500"),
+    ("Which languages do you speak?", "Tamil"),
+    ("What is your Google rating?", "4.5/5"),
+    ("Is there a doctor on call?", "Doctor on Call"),
+]
+
+
+def build(name, ids, texts):
+    store = VectorStore(name, lexical=True)
+    store.clear()
+    store.add_many(ids, texts)
+    store.publish()
+    return store
+
+
+def evaluate(label, store, top_k=3):
+    answered = 0
+    first = 0
+    tokens = []
+    for question, fact in QUERIES:
+        hits = store.search(question, top_k=top_k)
+        context = "\n".join(h["text"] for h in hits)
+        tokens.append(count_tokens(context))
+        answered += fact in context
+        first += bool(hits) and fact in hits[0]["text"]
+
+    report(label, store, tokens, f"answered@{top_k} {answered}/{len(QUERIES)} | answered@1 {first}/{len(QUERIES)}")
+
+
+def evaluate_context(label, store):
+    """Same questions through core.get_hotel_context, served from `store`."""
+    core.HOTEL_INFO_STORE = store
+    answered = 0
+    tokens = []
+    for question, fact in QUERIES:
+        context = core.get_hotel_context(question)
+        tokens.append(count_tokens(context))
+        answered += fact in context
+
+    report(label, store, tokens, f"answered {answered}/{len(QUERIES)}")
+
+
+def report(label, store, tokens, answered):
+    n = len(tokens)
+    print(f"{label:<12}| {len(store):4d} docs | context {sum(tokens) / n:6.1f} tokens avg, {max(tokens):4d} max "
+          f"| {answered}")
+
+
+def run(max_tokens=HOTEL_INFO_CHUNK_TOKENS, overlap=HOTEL_INFO_CHUNK_OVERLAP):
+    with open("data/hotel_info.txt", "r", encoding="utf-8") as f:
+        content = f.read()
+
+    sections = split_sections(content)
+    evaluate("sections", build("__bench_sections__",
+                               [f"info_{n}" for n in range(len(sections))],
+                               [f"[{name}]\n{body}" for name, body in sections]))
+
+    chunks, _ = chunk_document(content, max_tokens, overlap)
+    store = build("__bench_chunks__", [c["id"] for c in chunks], [c["text"] for c in chunks])
+    evaluate(f"chunks {max_tokens}", store)
+    evaluate_context("chat context", store)
+
+
+if __name__ == "__main__":
+    services_rag.EMBED_CACHE = None
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,59 @@
+"""
+Throughput of the no-model embedders: the old per-text seeded-RNG vectors vs
+the hashing-trick embedder (and the sentence-transformers model if installed),
+plus a quick check that the hashing vectors carry lexical similarity.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_embed.py [texts]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_DIM, EMBED_MODEL_NAME
+import hash_embed
+
+
+def seeded_rng_embed(texts):
+    # The previous fallback: random vectors seeded from the (per-process salted) str hash.
+    return np.array([np.random.RandomState(abs(hash(t)) % (2**32)).rand(EMBEDDING_DIM) for t in texts])
+
+
+def timed(label, fn, texts):
+    fn(texts[:100])
+    start = time.perf_counter()
+    fn(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22}| {len(texts) / elapsed / 1000:9.2f} texts/ms")
+
+
+def run(count=100_000):
+    texts = [f"Name {i} | guest{i}@example.com booking {i % 977}" for i in range(count)]
+    print(f"{count} texts, dim={EMBEDDING_DIM}")
+
+    timed("seeded RNG (old)", seeded_rng_embed, texts[:10_000])
+    timed("hashing", lambda t: hash_embed.embed_texts(t, EMBEDDING_DIM), texts)
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(EMBED_MODEL_NAME)
+    except Exception:
+        model = None
+    if model:
+        timed("sentence-transformers", model.encode, texts[:2_000])
+
+    pairs = [
+        ("What time is check-in?", "Check-in time is 2 PM"),
+        ("wifi password", "The WiFi password is guest123"),
+        ("wifi password", "Check-in time is 2 PM"),
+    ]
+    for a, b in pairs:
+        va, vb = hash_embed.embed_texts([a, b], EMBEDDING_DIM)
+        print(f"cos({a!r}, {b!r}) = {float(va @ vb):.2f}")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,66 @@
+"""
+Flexible-date search: every start date in a window at once vs one
+availability + pricing check per candidate date.
+
+Uses the synthetic property of bench_availability and a rate calendar from
+bench_rates. The sliding-window path is OccupancyIndex.free_counts_by_start
+plus one RateCalendar.quote_types call; the per-date path calls free_counts
+and quote for each start date, as repeated pms_check_availability_pricing
+calls would (minus the database round trips).
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_flexible_search.py [window_days] [nights] [rooms] [room_types]
+"""
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import OccupancyIndex
+from rates import RateCalendar
+from bench_availability import synthetic_year
+from bench_rates import synthetic_rules
+
+
+def run(window_days=30, nights=3, rooms=200, room_types=8, repeats=50):
+    origin, room_list, stays = synthetic_year(rooms, room_types, 0.8)
+    index = OccupancyIndex.build(room_list, stays, origin=origin)
+    type_ids = list(range(1, room_types + 1))
+    calendar = RateCalendar.build(type_ids, synthetic_rules(room_types), origin=origin)
+    max_adults = [2] * room_types
+    last = origin + timedelta(days=window_days - nights)
+    starts = window_days - nights + 1
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        types, counts = index.free_counts_by_start(origin, last, nights)
+        check_ins = np.arange(starts)
+        prices = calendar.quote_types(types, check_ins, check_ins + nights, 2, max_adults)
+        prices[counts.T == 0] = np.nan
+        best_window = np.nanmin(prices)
+    window_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        best_loop = float("inf")
+        for day in range(starts):
+            check_in = origin + timedelta(days=day)
+            check_out = check_in + timedelta(days=nights)
+            free = index.free_counts(check_in, check_out)
+            quote = calendar.quote(check_in, check_out, 2, max_adults)
+            for t, total in quote.items():
+                if free.get(t, 0):
+                    best_loop = min(best_loop, total)
+    loop_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    print(f"{rooms} rooms, {room_types} types | {nights}-night stays over a {window_days}-day window ({starts} start dates)")
+    print(f"sliding windows {window_ms:8.2f} ms/search")
+    print(f"per-date checks {loop_ms:8.2f} ms/search | same cheapest: {round(best_window, 2) == best_loop}")
+
+
+if __name__ == "__main__":
+    run(*(int(a) for a in sys.argv[1:5]))
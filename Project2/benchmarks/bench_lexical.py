@@ -0,0 +1,52 @@
+"""
+BM25 load and query cost: rebuilding the index from the texts (what every
+snapshot load used to do) vs mapping the frozen CSR file saved with it.
+
+Queries are the hybrid path's lexical half: one very common token ("guest"
+is in every row), a common + rare pair, and an email identifier.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_lexical.py [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm25_index import BM25Index, tokenize
+from bench_metadata_load import synthetic_rows, timed
+
+QUERIES = {
+    "common": "guest",
+    "common + rare": "guest surname42",
+    "identifier": "guest17@example17.com",
+}
+
+
+def run(n, folder, repeats=20):
+    texts = [row["text"] for row in synthetic_rows(n)]
+    path = Path(folder) / "lex.bin"
+
+    built, build_ms = timed(lambda: BM25Index.build(texts))
+    with open(path, "wb") as f:
+        built.write(f)
+    loaded, load_ms = timed(lambda: BM25Index.load(path))
+
+    print(f"{n:>9} rows | rebuild from texts {build_ms:9.1f} ms | map {os.path.getsize(path) / 2**20:6.1f} MB file "
+          f"{load_ms:7.3f} ms")
+    for label, query in QUERIES.items():
+        tokens = tokenize(query)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            loaded.score(tokens, limit=n)
+        print(f"{'':>9}      | {label:<14} {(time.perf_counter() - start) * 1000 / repeats:8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [20_000, 200_000]
+    with tempfile.TemporaryDirectory() as folder:
+        for n in sizes:
+            run(n, folder)
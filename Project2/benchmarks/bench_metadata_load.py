@@ -0,0 +1,65 @@
+"""
+Disk size and load time: indent=2 JSON metadata vs the packed format.
+
+"load" is what VectorStore._load pays at import time; "load + 3 hits" adds
+decoding the rows of one search result.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_metadata_load.py [rows ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packed_meta import PackedMetadata
+
+
+def synthetic_rows(n):
+    return [
+        {"id": str(i), "text": f"Guest Number{i} Surname{i % 977} | guest{i}@example{i % 53}.com"}
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run(n, folder):
+    rows = synthetic_rows(n)
+    json_path = Path(folder) / "metadata.json"
+    packed_path = Path(folder) / "meta.bin"
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    with open(packed_path, "wb") as f:
+        PackedMetadata.write(f, rows)
+
+    def load_json():
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    hits = [0, n // 2, n - 1]
+
+    meta, json_ms = timed(load_json)
+    _, json_hit_ms = timed(lambda: [meta[i]["text"] for i in hits])
+    packed, packed_ms = timed(lambda: PackedMetadata.load(packed_path))
+    _, packed_hit_ms = timed(lambda: [packed[i]["text"] for i in hits])
+
+    print(f"{n:>9} rows | json {os.path.getsize(json_path) / 2**20:7.1f} MB, load {json_ms:9.2f} ms, "
+          f"+3 hits {json_hit_ms:6.3f} ms | packed {os.path.getsize(packed_path) / 2**20:7.1f} MB, "
+          f"load {packed_ms:7.3f} ms, +3 hits {packed_hit_ms:6.3f} ms")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    with tempfile.TemporaryDirectory() as folder:
+        for n in sizes:
+            run(n, folder)
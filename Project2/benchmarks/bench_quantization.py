@@ -0,0 +1,146 @@
+"""
+Disk size, resident memory, latency and recall@k of float32 vs int8 rows.
+
+The vectors are saved the way VectorStore saves a snapshot: emb.npy without
+quantization, only the q/qscale .npy files with RAG_QUANTIZATION = "int8".
+Every variant runs in a fresh process that maps its files read-only, as a
+worker with RAG_MMAP does. "float32 in RAM" loads the matrix privately
+(RAG_MMAP = False) for comparison.
+
+How much the process's RSS grew while answering the queries is split into
+"private" (anonymous memory, per worker) and "mapped" (file pages, shared by
+every worker and reclaimable).
+
+By default runs on a clustered synthetic corpus. Pass a store name (e.g.
+"customers") to use the vectors of a saved RAG store instead; queries are
+perturbed copies of its own rows.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_quantization.py [rows | store_name] [queries]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_DIM
+from ann_index import top_k_indices
+from quantize import QuantizedMatrix
+
+VARIANTS = {
+    "float32 in RAM": None,
+    "float32 mmap": None,
+    "int8": "int8",
+}
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def clustered_corpus(rows, clusters=500, spread=0.35, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, EMBEDDING_DIM))
+    labels = rng.integers(0, clusters, rows)
+    return normalize(centers[labels] + spread * rng.standard_normal((rows, EMBEDDING_DIM)))
+
+
+def resident_mb():
+    """(private, file-backed) RSS of this process in MB, or None without /proc."""
+    found = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    key, value = line.split(":")
+                    found[key] = int(value.split()[0]) / 2**10
+        return found["RssAnon"], found["RssFile"]
+    except Exception:
+        return None
+
+
+def measure(folder, variant):
+    """Child process: map the saved files, answer every query, report one JSON line."""
+    mode = VARIANTS[variant]
+    qs = np.load(os.path.join(folder, "queries.npy"))
+    truth = np.load(os.path.join(folder, "truth.npy"))
+    before = resident_mb()
+
+    if mode is None:
+        corpus = np.load(os.path.join(folder, "emb.npy"), mmap_mode=None if variant == "float32 in RAM" else "r")
+        scores = lambda q: corpus @ q
+    else:
+        qm = QuantizedMatrix.load(os.path.join(folder, f"q_{mode}.npy"), os.path.join(folder, f"qscale_{mode}.npy"))
+        scores = qm.scores
+
+    k = truth.shape[1]
+    start = time.perf_counter()
+    found = [top_k_indices(scores(q), k) for q in qs]
+    ms = (time.perf_counter() - start) * 1000 / len(qs)
+    after = resident_mb()
+
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    print(json.dumps({
+        "ms": ms,
+        "recall": float(recall),
+        "private_mb": None if before is None else after[0] - before[0],
+        "mapped_mb": None if before is None else after[1] - before[1],
+    }))
+
+
+def run(corpus, queries=200, top_k=10):
+    rng = np.random.default_rng(1)
+    corpus = np.ascontiguousarray(corpus, dtype=np.float32)
+    qs = normalize(corpus[rng.choice(len(corpus), queries)]
+                   + 0.1 * rng.standard_normal((queries, EMBEDDING_DIM)))
+    k = min(top_k, len(corpus))
+
+    with tempfile.TemporaryDirectory() as folder:
+        np.save(os.path.join(folder, "emb.npy"), corpus)
+        np.save(os.path.join(folder, "queries.npy"), qs)
+        np.save(os.path.join(folder, "truth.npy"), np.stack([top_k_indices(corpus @ q, k) for q in qs]))
+        sizes = {None: corpus.nbytes}
+        qm = QuantizedMatrix.build(corpus, "int8")
+        np.save(os.path.join(folder, "q_int8.npy"), qm.codes)
+        np.save(os.path.join(folder, "qscale_int8.npy"), qm.scales)
+        sizes["int8"] = qm.nbytes
+        del corpus
+
+        print(f"{len(qs)} queries over {sizes[None] // (EMBEDDING_DIM * 4)} rows, top_k={k}")
+        print(f"{'':<15}| {'on disk':>8} | {'private':>8} | {'mapped':>8} | {'latency':>13} | recall")
+        for variant, mode in VARIANTS.items():
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", folder, variant],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            private, mapped = (
+                "n/a" if result[key] is None else f"{result[key]:5.1f} MB" for key in ("private_mb", "mapped_mb")
+            )
+            print(f"{variant:<15}| {sizes[mode] / 2**20:5.1f} MB | {private:>8} | {mapped:>8} | "
+                  f"{result['ms']:7.3f} ms/q | {result['recall']:.3f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        measure(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "200000"
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    if target.isdigit():
+        corpus = clustered_corpus(int(target))
+    else:
+        from services_rag import VectorStore
+        # A quantized store yields its dequantized rows.
+        corpus = np.asarray(VectorStore(target).snapshot.embeddings[:], dtype=np.float32)
+
+    run(corpus, queries)
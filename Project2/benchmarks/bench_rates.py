@@ -0,0 +1,87 @@
+"""
+Quoting stays with the rate calendar vs the old per-room-type pricing loop.
+
+A synthetic rate setup (per-type base rates, a recurring peak season and a
+weekend uplift) is turned into a RateCalendar; random stays are priced for
+every room type by one RateCalendar.quote_offsets call and by a Python loop
+that sums nightly rates and applies extra-guest and long-stay rules the way
+pms_check_availability_pricing used to.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_rates.py [stays] [room_types]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rates import RateCalendar
+
+
+def synthetic_rules(room_types, seed=0):
+    rng = random.Random(seed)
+    return {
+        "default_rate": 100.0,
+        "base_rates": {t: float(rng.randrange(80, 400, 5)) for t in range(1, room_types + 1)},
+        "seasons": [
+            {"start": "06-15", "end": "08-31", "multiplier": 1.3},
+            {"start": "12-20", "end": "01-05", "multiplier": 1.5},
+            {"start": "01-01", "end": "12-31", "multiplier": 1.1, "weekdays": [4, 5]},
+        ],
+        "extra_guest_fee": 20.0,
+        "long_stay": [(7, 0.85), (5, 0.90)],
+    }
+
+
+def loop_quote(calendar, max_adults, start, end, guests):
+    """One stay, one room type at a time, as the old pricing loop did."""
+    totals = []
+    nights = end - start
+    for col in range(len(calendar.type_ids)):
+        total = 0.0
+        for night in range(start, end):
+            total += calendar.nightly[col, night]
+        if guests > max_adults[col]:
+            total += (guests - max_adults[col]) * 20 * nights
+        if nights >= 7:
+            total *= 0.85
+        elif nights >= 5:
+            total *= 0.90
+        totals.append(total)
+    return totals
+
+
+def run(stays=10000, room_types=12):
+    rules = synthetic_rules(room_types)
+    start = time.perf_counter()
+    calendar = RateCalendar.build(range(1, room_types + 1), rules, origin=date.today(), horizon_days=730)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{room_types} room types x {calendar.horizon} nights | calendar built in {build_ms:.1f} ms")
+
+    rng = np.random.default_rng(1)
+    starts = rng.integers(0, 700, stays)
+    ends = starts + rng.integers(1, 15, stays)
+    guests = rng.integers(1, 5, stays)
+    max_adults = np.array([2 + t % 2 for t in range(room_types)])
+
+    start = time.perf_counter()
+    totals, _ = calendar.quote_offsets(starts, ends, guests, max_adults)
+    vector_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    looped = [loop_quote(calendar, max_adults, int(s), int(e), int(g)) for s, e, g in zip(starts, ends, guests)]
+    loop_ms = (time.perf_counter() - start) * 1000
+
+    same = np.allclose(totals, np.array(looped))
+    print(f"{stays} stays x {room_types} room types")
+    print(f"calendar quote {vector_ms:9.1f} ms ({vector_ms * 1000 / stays:.2f} us/stay)")
+    print(f"pricing loop   {loop_ms:9.1f} ms ({loop_ms * 1000 / stays:.2f} us/stay) | same totals: {same}")
+
+
+if __name__ == "__main__":
+    run(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,54 @@
+"""
+Throughput of VectorStore.search_many vs a loop of VectorStore.search.
+
+The embedding cache is disabled and the no-model fallback embedder is used,
+so the numbers are dominated by scoring rather than by the model.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_search_many.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_DIM
+import services_rag
+from services_rag import VectorStore, normalize_rows
+
+
+def synthetic_store(rows):
+    store = VectorStore("__bench_search_many__")
+    store.clear()
+    store.embeddings = normalize_rows(np.random.default_rng(0).standard_normal((rows, EMBEDDING_DIM)))
+    store.metadata = [{"id": str(i), "text": f"row {i}"} for i in range(rows)]
+    store.publish()
+    return store
+
+
+def run(rows=100_000, top_k=3):
+    store = synthetic_store(rows)
+    print(f"{rows} rows, top_k={top_k}")
+
+    for batch in (1, 8, 64, 512):
+        queries = [f"guest question {i}" for i in range(batch)]
+
+        start = time.perf_counter()
+        looped = [store.search(q, top_k) for q in queries]
+        loop_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = store.search_many(queries, top_k)
+        batch_s = time.perf_counter() - start
+
+        same = [r["id"] for r in looped[-1]] == [r["id"] for r in batched[-1]]
+        print(f"batch {batch:>4} | loop {batch / loop_s:9.0f} q/s | search_many {batch / batch_s:9.0f} q/s | "
+              f"speedup {loop_s / batch_s:5.1f}x | same results: {same}")
+
+
+if __name__ == "__main__":
+    services_rag.EMBED_CACHE = None
+    run(*[int(a) for a in sys.argv[1:]])
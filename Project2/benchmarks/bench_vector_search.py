@@ -0,0 +1,61 @@
+"""
+Microbenchmark for VectorStore.search.
+
+Compares the old search (norm over the whole matrix + full argsort on float64)
+with the pre-normalized float32 matrix + argpartition path.
+
+Usage (from the Project2 folder):
+    python benchmarks/bench_vector_search.py [rows ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMBEDDING_DIM
+from services_rag import normalize_rows, top_k_indices
+
+
+def legacy_search(embeddings, qv, top_k):
+    sims = (embeddings @ qv) / (
+        np.linalg.norm(embeddings, axis=1) * np.linalg.norm(qv) + 1e-8
+    )
+    return np.argsort(sims)[::-1][:top_k]
+
+
+def fast_search(embeddings, qv, top_k):
+    sims = embeddings @ normalize_rows(qv)
+    return top_k_indices(sims, top_k)
+
+
+def time_it(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(rows, top_k=3, repeats=5):
+    rng = np.random.default_rng(0)
+    raw = rng.standard_normal((rows, EMBEDDING_DIM))
+    qv = rng.standard_normal(EMBEDDING_DIM)
+
+    normalized = normalize_rows(raw)
+
+    legacy_ms = time_it(lambda: legacy_search(raw, qv, top_k), repeats)
+    fast_ms = time_it(lambda: fast_search(normalized, qv, top_k), repeats)
+
+    same = set(legacy_search(raw, qv, top_k)) == set(fast_search(normalized, qv, top_k))
+    print(f"{rows:>9} rows | legacy {legacy_ms:9.2f} ms | fast {fast_ms:8.2f} ms | "
+          f"speedup {legacy_ms / fast_ms:5.1f}x | same top-{top_k}: {same}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for n in sizes:
+        run(n)
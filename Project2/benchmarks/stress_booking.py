@@ -0,0 +1,208 @@
+"""
+Concurrency stress test for create_booking, against a SQLite stand-in for MySQL.
+
+Many threads book short stays on the same few rooms at once. Every thread
+sees an empty (maximally stale) occupancy index, so every one of them
+believes all rooms are free and only the database transaction stands
+between them and a double booking. Afterwards the booking_block table is
+checked for overlapping stays on the same room.
+
+The stand-in runs services_pms unchanged through a small adapter:
+"%s" placeholders become "?", begin() is BEGIN IMMEDIATE (SQLite's
+database-wide write lock plays the part of SELECT ... FOR UPDATE, which is
+dropped), and a busy timeout is raised as MySQL error 1205. Each
+transaction holds the lock for `hold_ms` after its FOR UPDATE query (the
+round trips a transaction spends on a real MySQL server). With the default
+16 threads queued behind each other, waits add up past `lock_timeout_ms`,
+so lock waits do time out and the retry path runs. The report counts the
+retries and the bookings that ran out of them; pass hold_ms 0 for the
+uncontended case. --legacy runs the old select-then-insert flow instead,
+for comparison.
+
+Usage (from the Project2 folder):
+    python benchmarks/stress_booking.py [threads] [bookings_per_thread] [rooms] [hold_ms] [lock_timeout_ms] [--legacy]
+"""
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import pymysql
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services_pms
+from availability import OccupancyIndex
+from db_pool import ConnectionPool
+
+SCHEMA = """
+CREATE TABLE room (room_id INTEGER PRIMARY KEY, room_type_id INTEGER, is_deleted INTEGER, can_be_sold_online INTEGER);
+CREATE TABLE booking (booking_id INTEGER PRIMARY KEY AUTOINCREMENT, booking_customer_id INTEGER, company_id INTEGER, is_deleted INTEGER);
+CREATE TABLE booking_block (booking_id INTEGER, room_id INTEGER, check_in_date TEXT, check_out_date TEXT);
+"""
+
+
+def _locked(error):
+    return pymysql.err.OperationalError(1205, f"Lock wait timeout exceeded (sqlite: {error})")
+
+
+class SQLiteCursor:
+    def __init__(self, cursor, hold):
+        self._cursor = cursor
+        self._hold = hold
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, query, params=()):
+        locking = "FOR UPDATE" in query
+        query = query.replace("%s", "?").replace("FOR UPDATE", "")
+        try:
+            self._cursor.execute(query, [str(p) if isinstance(p, date) else p for p in params])
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                raise _locked(e)
+            raise
+        if locking:
+            time.sleep(self._hold)
+
+    def _rows(self, rows):
+        names = [d[0] for d in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def fetchone(self):
+        rows = self._rows(self._cursor.fetchmany(1))
+        return rows[0] if rows else None
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+
+class SQLiteConnection:
+    """Just enough of a pymysql connection for services_pms."""
+
+    def __init__(self, path, lock_timeout, hold):
+        self._db = sqlite3.connect(path, timeout=lock_timeout, isolation_level=None, check_same_thread=False)
+        self._hold = hold
+
+    def cursor(self):
+        return SQLiteCursor(self._db.cursor(), self._hold)
+
+    def begin(self):
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            raise _locked(e)
+
+    def commit(self):
+        if self._db.in_transaction:
+            self._db.execute("COMMIT")
+
+    def rollback(self):
+        if self._db.in_transaction:
+            self._db.execute("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        self._db.execute("SELECT 1")
+
+    def close(self):
+        self._db.close()
+
+
+def legacy_create_booking(customer_id, room_type_id, check_in, check_out):
+    """The old flow: pick a room the index says is free, then insert in separate autocommit steps."""
+    index = services_pms.get_occupancy_index()
+    candidates = index.free_rooms(room_type_id, check_in, check_out)
+    if not candidates:
+        return None
+    booking_id = services_pms.execute_insert(
+        "INSERT INTO booking (booking_customer_id, company_id, is_deleted) VALUES (%s, %s, %s)",
+        (customer_id, 1, 0),
+    )
+    services_pms.execute_insert(
+        "INSERT INTO booking_block (booking_id, room_id, check_in_date, check_out_date) VALUES (%s, %s, %s, %s)",
+        (booking_id, candidates[0], check_in, check_out),
+    )
+    return booking_id
+
+
+def overlapping_stays(path):
+    db = sqlite3.connect(path)
+    (count,) = db.execute("""
+        SELECT COUNT(*) FROM booking_block a
+        JOIN booking_block b ON a.room_id = b.room_id AND a.rowid < b.rowid
+        WHERE a.check_in_date < b.check_out_date AND b.check_in_date < a.check_out_date
+    """).fetchone()
+    db.close()
+    return count
+
+
+def run(threads=16, bookings=25, rooms=4, hold_ms=5, lock_timeout_ms=40, legacy=False):
+    path = os.path.join(tempfile.mkdtemp(prefix="stress_booking_"), "pms.sqlite")
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.executemany("INSERT INTO room VALUES (?, 1, 0, 1)", [(r,) for r in range(1, rooms + 1)])
+    db.commit()
+    db.close()
+
+    services_pms.DB_POOL = ConnectionPool(
+        lambda: SQLiteConnection(path, lock_timeout_ms / 1000, hold_ms / 1000), max_size=threads, timeout=30
+    )
+    room_list = [(r, 1) for r in range(1, rooms + 1)]
+    services_pms.get_occupancy_index = lambda: OccupancyIndex.build(room_list, [])
+    book = legacy_create_booking if legacy else services_pms.create_booking
+
+    origin = date.today() + timedelta(days=1)
+    results = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        mine = []
+        for _ in range(bookings):
+            check_in = origin + timedelta(days=rng.randint(0, 13))
+            check_out = check_in + timedelta(days=rng.randint(1, 4))
+            mine.append(book(seed, 1, check_in, check_out))
+        with lock:
+            results.extend(mine)
+
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    elapsed = time.perf_counter() - start
+
+    made = sum(1 for r in results if r)
+    retries = log.getvalue().count("Lock conflict")
+    errors = log.getvalue().count("[ERROR]")
+    gave_up = log.getvalue().count("Failed to create booking: (1205")
+    overlaps = overlapping_stays(path)
+    print(f"{'legacy' if legacy else 'transactional'} create_booking: {threads} threads x {bookings} attempts "
+          f"on {rooms} rooms, lock held {hold_ms} ms, lock wait timeout {lock_timeout_ms} ms")
+    print(f"booked {made}, refused {len(results) - made} ({errors} errors, {gave_up} out of lock retries), "
+          f"{retries} lock retries in {elapsed:.2f}s")
+    print(f"overlapping stays on the same room: {overlaps}")
+    return overlaps
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    overlaps = run(*(int(a) for a in args[:5]), legacy="--legacy" in sys.argv)
+    sys.exit(1 if overlaps and "--legacy" not in sys.argv else 0)
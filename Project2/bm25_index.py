@@ -0,0 +1,281 @@
+import hashlib
+import math
+import mmap
+import re
+import struct
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Emails, dotted/hyphenated codes and similar multi-part tokens, kept whole.
+_COMPOUND = re.compile(r"[a-z0-9]+(?:[._@+\-][a-z0-9]+)+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from have how i in is it me my "
+    "of on or our please the there this to we what when where which with you your".split()
+)
+
+
+MAGIC = b"NXBM251\0"
+# magic | documents | distinct tokens | postings | k1 | b
+_HEADER = struct.Struct("<8sQQQdd")
+# Unfrozen postings pack the term frequency into the low bits of the row number.
+_TF_BITS = 16
+_TF_MASK = (1 << _TF_BITS) - 1
+
+
+def tokenize(text: str):
+    text = text.lower()
+    words = [w for w in _WORD.findall(text) if w not in STOPWORDS]
+    return words + _COMPOUND.findall(text)
+
+
+def is_identifier(token: str):
+    """Tokens that name one record (emails, ids, phone numbers) rather than a topic."""
+    return "@" in token or (len(token) >= 4 and any(c.isdigit() for c in token))
+
+
+def token_hash(token: str):
+    """64-bit key a token is stored under in the frozen arrays."""
+    return np.uint64(int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little"))
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring over the rows of a VectorStore.
+
+    Saved postings are frozen into CSR arrays: token hashes (sorted), offsets
+    into them, and per posting the row (ascending within a token) and term
+    frequency, plus one length per document. write() stores exactly those
+    arrays and load() maps them back without touching any text, so a snapshot
+    is searchable as soon as its file is opened.
+
+    Rows added since the last freeze go to a small in-memory delta. Readers
+    pass the row count of the snapshot they are reading (`limit`), and
+    postings for rows appended after it are ignored.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._buf = None
+        self._hashes = np.zeros(0, dtype="<u8")
+        self._offsets = np.zeros(1, dtype="<u8")
+        self._rows = np.zeros(0, dtype="<u4")
+        self._tf = np.zeros(0, dtype="<f4")
+        self._lengths = np.zeros(0, dtype="<f4")
+        self._frozen_length = 0.0
+        # Unfrozen rows: token -> [row << _TF_BITS | tf, ...] (ascending), plus their document lengths.
+        self._delta = {}
+        self._delta_lengths = []
+
+    @property
+    def frozen_rows(self):
+        return self._lengths.shape[0]
+
+    @property
+    def doc_count(self):
+        return self.frozen_rows + len(self._delta_lengths)
+
+    @classmethod
+    def build(cls, texts):
+        index = cls()
+        index.add(0, texts)
+        return index.frozen()
+
+    def add(self, start_row, texts):
+        if start_row != self.doc_count:
+            raise ValueError(f"BM25 rows must be appended in order (expected row {self.doc_count}, got {start_row})")
+        for text in texts:
+            row = self.doc_count
+            tokens = tokenize(text)
+            for token, tf in Counter(tokens).items():
+                self._delta.setdefault(token, []).append(row << _TF_BITS | min(tf, _TF_MASK))
+            self._delta_lengths.append(len(tokens))
+
+    def __len__(self):
+        return self.doc_count
+
+    def _postings(self):
+        """Every posting as flat (hashes, rows, tf) arrays, frozen ones first."""
+        postings = list(self._delta.values())
+        delta_hashes = np.fromiter((token_hash(t) for t in self._delta), dtype="<u8", count=len(postings))
+        delta_counts = np.fromiter((len(p) for p in postings), dtype=np.int64, count=len(postings))
+        packed = np.fromiter(chain.from_iterable(postings), dtype=np.int64)
+        hashes = np.concatenate([
+            np.repeat(self._hashes, np.diff(self._offsets.astype(np.int64))),
+            np.repeat(delta_hashes, delta_counts),
+        ])
+        rows = np.concatenate([self._rows, (packed >> _TF_BITS).astype("<u4")])
+        tf = np.concatenate([self._tf, (packed & _TF_MASK).astype("<f4")])
+        return hashes, rows, tf
+
+    def _with_postings(self, hashes, rows, tf, lengths):
+        order = np.lexsort((rows, hashes))
+        hashes = hashes[order]
+        index = BM25Index(self.k1, self.b)
+        index._hashes, starts = np.unique(hashes, return_index=True)
+        index._offsets = np.append(starts, len(hashes)).astype("<u8")
+        index._rows = np.ascontiguousarray(rows[order], dtype="<u4")
+        index._tf = np.ascontiguousarray(tf[order], dtype="<f4")
+        index._lengths = np.ascontiguousarray(lengths, dtype="<f4")
+        index._frozen_length = float(index._lengths.sum(dtype=np.float64))
+        return index
+
+    def frozen(self):
+        """A new index with the delta merged into the CSR arrays (self if there is none)."""
+        if not self._delta_lengths:
+            return self
+        lengths = np.concatenate([self._lengths, np.asarray(self._delta_lengths, dtype="<f4")])
+        return self._with_postings(*self._postings(), lengths)
+
+    def without_rows(self, dead):
+        """A frozen index with the rows in `dead` dropped and later rows renumbered, as compaction does."""
+        dead = np.unique(np.asarray(list(dead), dtype=np.int64))
+        hashes, rows, tf = self._postings()
+        keep = ~np.isin(rows, dead)
+        rows = rows[keep].astype(np.int64)
+        rows -= np.searchsorted(dead, rows)
+        lengths = np.concatenate([self._lengths, np.asarray(self._delta_lengths, dtype="<f4")])
+        alive = np.ones(lengths.shape[0], dtype=bool)
+        alive[dead[dead < lengths.shape[0]]] = False
+        return self._with_postings(hashes[keep], rows, tf[keep], lengths[alive])
+
+    def _total_length(self, limit):
+        frozen = self.frozen_rows
+        if limit < frozen:
+            return float(self._lengths[:limit].sum(dtype=np.float64))
+        return self._frozen_length + sum(self._delta_lengths[:limit - frozen])
+
+    def _token_postings(self, token, limit):
+        """(rows, tf) of `token` for rows < limit; None when there are none."""
+        all_rows = []
+        all_tf = []
+        key = token_hash(token)
+        i = np.searchsorted(self._hashes, key)
+        if i < self._hashes.shape[0] and self._hashes[i] == key:
+            lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+            rows = self._rows[lo:hi]
+            cut = int(np.searchsorted(rows, limit))
+            if cut:
+                all_rows.append(rows[:cut])
+                all_tf.append(self._tf[lo:lo + cut])
+
+        delta = self._delta.get(token)
+        if delta is not None and limit > self.frozen_rows:
+            packed = np.asarray(delta, dtype=np.int64)
+            packed = packed[:np.searchsorted(packed, limit << _TF_BITS)]
+            if packed.shape[0]:
+                all_rows.append((packed >> _TF_BITS).astype("<u4"))
+                all_tf.append((packed & _TF_MASK).astype("<f4"))
+
+        if not all_rows:
+            return None, None
+        if len(all_rows) == 1:
+            return all_rows[0], all_tf[0]
+        return np.concatenate(all_rows), np.concatenate(all_tf)
+
+    def _doc_lengths(self, rows):
+        frozen = self.frozen_rows
+        if rows[-1] < frozen:
+            return self._lengths[rows]
+        split = int(np.searchsorted(rows, frozen))
+        delta = np.asarray(self._delta_lengths, dtype="<f4")
+        return np.concatenate([self._lengths[rows[:split]], delta[rows[split:] - frozen]])
+
+    def score(self, tokens, limit):
+        """(rows, scores) for every row matching at least one of `tokens`, rows < limit."""
+        limit = min(limit, self.doc_count)
+        avgdl = max(self._total_length(limit) / max(limit, 1), 1e-8)
+        all_rows = []
+        all_scores = []
+        for token in set(tokens):
+            rows, tf = self._token_postings(token, limit)
+            if rows is None:
+                continue
+            df = rows.shape[0]
+            idf = math.log(1 + (limit - df + 0.5) / (df + 0.5))
+            dl = self._doc_lengths(rows)
+            all_rows.append(rows)
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avgdl)))
+
+        if not all_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if len(all_rows) == 1:
+            # One token's rows are already unique and ascending.
+            return all_rows[0].astype(np.int64), all_scores[0].astype(np.float32)
+
+        rows = np.concatenate(all_rows)
+        scores = np.concatenate(all_scores)
+        if rows.shape[0] * 16 > limit:
+            # Dense accumulation beats sorting once the postings cover much of the store.
+            summed = np.bincount(rows, weights=scores, minlength=limit)
+            unique = np.flatnonzero(summed)
+            return unique, summed[unique].astype(np.float32)
+        unique, inverse = np.unique(rows, return_inverse=True)
+        return unique.astype(np.int64), np.bincount(inverse, weights=scores).astype(np.float32)
+
+    def identifier_tokens(self, tokens, limit, dead=None):
+        """
+        Identifier-like query tokens that match a row a snapshot of `limit`
+        rows can serve, i.e. below `limit` and not in the sorted `dead` array.
+        """
+        found = []
+        for token in set(tokens):
+            if not is_identifier(token):
+                continue
+            rows, _ = self._token_postings(token, limit)
+            if rows is None:
+                continue
+            if dead is not None and len(dead) and np.isin(rows, dead).all():
+                continue
+            found.append(token)
+        return found
+
+    def write(self, file):
+        """Serialize the frozen arrays to an open binary file (call frozen() first)."""
+        if self._delta_lengths:
+            raise ValueError("BM25Index.write needs a frozen index")
+        file.write(_HEADER.pack(
+            MAGIC, self.frozen_rows, self._hashes.shape[0], self._rows.shape[0], self.k1, self.b
+        ))
+        for array, dtype in (
+            (self._hashes, "<u8"), (self._offsets, "<u8"),
+            (self._rows, "<u4"), (self._tf, "<f4"), (self._lengths, "<f4"),
+        ):
+            file.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        with open(path, "rb") as f:
+            if use_mmap:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = f.read()
+
+        magic, n, terms, postings, k1, b = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a BM25 index file")
+
+        index = cls(k1, b)
+        index._buf = buf
+        pos = _HEADER.size
+        arrays = []
+        for dtype, count in (("<u8", terms), ("<u8", terms + 1), ("<u4", postings), ("<f4", postings), ("<f4", n)):
+            arrays.append(np.frombuffer(buf, dtype=dtype, count=count, offset=pos))
+            pos += np.dtype(dtype).itemsize * count
+        index._hashes, index._offsets, index._rows, index._tf, index._lengths = arrays
+        index._frozen_length = float(index._lengths.sum(dtype=np.float64))
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several best-first lists of rows; returns (rows, fused scores), best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [row for row, _ in ordered], [score for _, score in ordered]
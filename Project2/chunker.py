@@ -0,0 +1,182 @@
+import re
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SECTION = re.compile(r"^=== (.+?) ===\s*$", re.MULTILINE)
+_QUESTION = re.compile(r"^Q:", re.IGNORECASE)
+_ANSWER = re.compile(r"^A:", re.IGNORECASE)
+
+
+def count_tokens(text: str):
+    """Approximate token count (words and punctuation marks); no tokenizer needed."""
+    return len(_TOKEN.findall(text))
+
+
+def split_sections(content: str, default="General Info"):
+    """[(section name, body)] for `=== NAME ===` headed blocks, in file order."""
+    sections = []
+    name = default
+    pos = 0
+    for match in _SECTION.finditer(content):
+        sections.append((name, content[pos:match.start()].strip()))
+        name = match.group(1).strip()
+        pos = match.end()
+    sections.append((name, content[pos:].strip()))
+    return [(name, body) for name, body in sections if body]
+
+
+def split_units(body: str):
+    """
+    Atomic pieces of a section body, as (text, is_qa): each Q:/A: pair stays
+    together; other text is split into paragraphs on blank lines.
+    """
+    units = []
+    current = []
+    current_qa = False
+
+    def flush():
+        if current:
+            units.append(("\n".join(current), current_qa))
+            current.clear()
+
+    for line in body.splitlines():
+        line = line.strip()
+        if not line:
+            # A blank line ends a paragraph, but not a question still waiting for its answer.
+            if not (current_qa and not any(_ANSWER.match(l) for l in current)):
+                flush()
+                current_qa = False
+            continue
+        if _QUESTION.match(line):
+            flush()
+            current_qa = True
+        current.append(line)
+    flush()
+    return units
+
+
+def _split_long(text, max_tokens):
+    """Break a unit over the budget on line boundaries, then on word boundaries."""
+    pieces = []
+    for line in text.splitlines():
+        if count_tokens(line) <= max_tokens:
+            pieces.append(line)
+            continue
+        words = line.split()
+        part = []
+        for word in words:
+            if part and count_tokens(" ".join(part + [word])) > max_tokens:
+                pieces.append(" ".join(part))
+                part = []
+            part.append(word)
+        if part:
+            pieces.append(" ".join(part))
+
+    merged = []
+    for piece in pieces:
+        if merged and count_tokens(merged[-1] + "\n" + piece) <= max_tokens:
+            merged[-1] += "\n" + piece
+        else:
+            merged.append(piece)
+    return merged
+
+
+def chunk_section(body: str, max_tokens=120, overlap=20):
+    """
+    Pack a section's units into chunks of at most `max_tokens` (header excluded).
+
+    Consecutive chunks share up to `overlap` tokens of whole trailing
+    paragraphs; Q/A pairs are self-contained and never repeated as overlap.
+    """
+    units = []
+    for text, is_qa in split_units(body):
+        if count_tokens(text) > max_tokens:
+            units.extend((piece, is_qa) for piece in _split_long(text, max_tokens))
+        else:
+            units.append((text, is_qa))
+
+    chunks = []
+    current = []
+    size = 0
+    for text, is_qa in units:
+        tokens = count_tokens(text)
+        if current and size + tokens > max_tokens:
+            chunks.append("\n\n".join(t for t, _ in current))
+
+            carried = []
+            carried_size = 0
+            for prev_text, prev_qa in reversed(current):
+                prev_tokens = count_tokens(prev_text)
+                if prev_qa or carried_size + prev_tokens > overlap or carried_size + prev_tokens + tokens > max_tokens:
+                    break
+                carried.insert(0, (prev_text, prev_qa))
+                carried_size += prev_tokens
+            current, size = carried, carried_size
+
+        current.append((text, is_qa))
+        size += tokens
+
+    if current:
+        chunks.append("\n\n".join(t for t, _ in current))
+    return chunks
+
+
+def chunk_document(content: str, max_tokens=120, overlap=20, prefix="info"):
+    """
+    Split a sectioned document into retrieval chunks.
+
+    Returns (chunks, sections): chunks are dicts with "id" ("<prefix>_<n>.<k>"),
+    "parent" ("<prefix>_<n>", the section it came from), "section" and "text"
+    (prefixed with "[SECTION]"); sections maps each parent id to the full
+    section text, for expanding a small chunk on demand.
+    """
+    chunks = []
+    sections = {}
+    for n, (name, body) in enumerate(split_sections(content)):
+        parent = f"{prefix}_{n}"
+        sections[parent] = f"[{name}]\n{body}"
+        for k, text in enumerate(chunk_section(body, max_tokens, overlap)):
+            chunks.append({
+                "id": f"{parent}.{k}",
+                "parent": parent,
+                "section": name,
+                "text": f"[{name}]\n{text}",
+            })
+    return chunks, sections
+
+
+def parent_id(chunk_id: str):
+    return chunk_id.split(".", 1)[0]
+
+
+def chunk_position(chunk_id: str):
+    """(parent id, index within the section) of a chunk id; index is None for other ids."""
+    parent, _, k = chunk_id.partition(".")
+    return parent, int(k) if k.isdigit() else None
+
+
+def neighbour_ids(chunk_id: str):
+    """Ids of the chunks just after and just before `chunk_id` in its section."""
+    parent, k = chunk_position(chunk_id)
+    if k is None:
+        return []
+    return [f"{parent}.{k + 1}"] + ([f"{parent}.{k - 1}"] if k > 0 else [])
+
+
+def merge_chunks(texts):
+    """
+    Join chunks of one section, given in section order, into a single
+    "[SECTION]" text; paragraphs repeated as overlap appear once.
+    """
+    header = None
+    paragraphs = []
+    for text in texts:
+        first, _, body = text.partition("\n")
+        if first.startswith("[") and first.endswith("]"):
+            header = header or first
+        else:
+            body = text
+        for paragraph in body.split("\n\n"):
+            if paragraph not in paragraphs:
+                paragraphs.append(paragraph)
+    merged = "\n\n".join(paragraphs)
+    return f"{header}\n{merged}" if header else merged
@@ -13,6 +13,48 @@ MYSQL_USER = "root"
 MYSQL_PASSWORD = "" 
 MYSQL_DATABASE = "nexrovatestdb"
 
+# Connection pool used by services_pms (sizes in connections, times in seconds).
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 10
+DB_POOL_TIMEOUT = 10        # max wait for a free connection
+DB_POOL_MAX_LIFETIME = 3600  # connections older than this are replaced
+DB_POOL_PING_AFTER = 30     # ping connections idle longer than this on checkout
+
+# Room-type catalog cache: refetched after the TTL, or every REFRESH_INTERVAL
+# seconds in the background when that is non-zero.
+ROOM_TYPE_CACHE_TTL = 300
+ROOM_TYPE_REFRESH_INTERVAL = 0
+
+# In-memory occupancy index (room x night); reloaded from booking_block this often.
+AVAILABILITY_RELOAD_INTERVAL = 60
+
+# create_booking retries lock wait timeouts / deadlocks this many times,
+# sleeping BACKOFF seconds (doubled on every retry, with jitter) in between.
+BOOKING_LOCK_RETRIES = 3
+BOOKING_RETRY_BACKOFF = 0.05
+
+# email -> customer_id cache of internal_create_customer, one per worker process.
+# invalidate_customer touches CUSTOMER_CACHE_STAMP, which every worker checks on
+# each lookup, so a delete through this app (or /customers/invalidate) empties all
+# of them at once. The TTL bounds how long a customer soft-deleted directly in the
+# PMS without that hook, or by another host, is still served.
+CUSTOMER_CACHE_SIZE = 10000
+CUSTOMER_CACHE_TTL = 60
+CUSTOMER_CACHE_STAMP = "rag_store/customer_cache.stamp"
+# Lets ensure_customer_email_index() add the unique (company_id, email) index the
+# customer upsert relies on. Off by default: the index also constrains the PMS's own
+# customer writes, so it belongs in migrations/001_customer_company_email_unique.sql.
+CUSTOMER_CREATE_EMAIL_INDEX = False
+
+# Rate calendar (room type x night). Nightly rates come from the PMS rate plans
+# where set; these defaults cover the rest.
+RATE_DEFAULT_NIGHTLY = 100.00
+RATE_EXTRA_GUEST_FEE = 20.00  # per night, per guest above the room type's max_adults
+RATE_LONG_STAY_DISCOUNTS = [(7, 0.85), (5, 0.90)]  # (min nights, price factor)
+RATE_SEASONS = []  # e.g. {"start": "12-20", "end": "01-05", "multiplier": 1.25}
+RATE_HORIZON_DAYS = 730
+RATE_RELOAD_INTERVAL = 300
+
 
 TWILIO_ACCOUNT_SID = "YOUR_TWILIO_SID"
 TWILIO_AUTH_TOKEN = "YOUR_TWILIO_AUTH_TOKEN"
@@ -21,7 +63,64 @@ DEFAULT_NOTIFICATION_TO = "whatsapp:+1234567890"
 
 
 RAG_FOLDER = "rag_store"
+RAG_MMAP = True              # map emb_*.npy read-only so worker processes share one copy
+RAG_REFRESH_INTERVAL = 5     # seconds between checks for a newer snapshot saved by another process
+RAG_SNAPSHOT_RETAIN = 3      # versioned snapshots kept on disk for rollback
+
+# Quantized rows: None or "int8". Snapshots are then saved as int8 codes plus a
+# scale per row (q_*.npy, qscale_*.npy; mapped like emb_*.npy with RAG_MMAP) and no
+# float32 file: a quarter of the disk and page cache, for recall@10 around 0.97-0.98.
+# Scans take about as long as float32 (up to 2x longer on small stores). Writes work
+# on a float32 copy until the next save. See benchmarks/bench_quantization.py.
+RAG_QUANTIZATION = None
+
+# Hybrid (BM25 + dense) search: each ranking is taken this many times top_k deep before fusion.
+RAG_HYBRID_DEPTH = 5
 EMBEDDING_DIM = 384
+EMBED_BATCH_SIZE = 256  # texts per MODEL.encode call during bulk ingest
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Persistent (model, text) -> vector cache under RAG_FOLDER, with an in-memory LRU in front.
+EMBED_CACHE_ENABLED = True
+EMBED_CACHE_DISK_MB = 512
+EMBED_CACHE_MEMORY_MB = 64
+
+# Approximate (IVF) search. Stores smaller than ANN_MIN_ROWS are always searched exactly.
+ANN_ENABLED = True
+ANN_MIN_ROWS = 20000
+ANN_NLIST = 0          # number of k-means buckets, 0 = sqrt(rows)
+ANN_NPROBE = 8         # buckets scanned per query; higher = better recall, slower
+# Rows appended after the index was trained are scanned exactly on every query; an
+# incremental sync retrains the index once they pass this fraction of the indexed rows.
+ANN_RETRAIN_RATIO = 0.2
+
+# Incremental RAG sync. Set a table's update-timestamp column to also pick up
+# edited rows; with None only new ids and soft deletes are detected, and finding
+# soft deletes means re-reading every deleted row of the table on each sync, so
+# that part of the cost grows with the table's deletion history, not the delta.
+RAG_SYNC_UPDATED_COLUMN = {"customer": None, "booking": None}
+RAG_COMPACT_RATIO = 0.2  # compact a store once this fraction of its rows are tombstones
+
+# Full rebuilds run the stores in parallel and stream large tables from MySQL in
+# chunks, so fetching the next chunk overlaps embedding the current one.
+RAG_BUILD_WORKERS = 4
+RAG_STREAM_CHUNK = 2000
+
+# Customer and booking stores are sharded per company_id; a shard not searched
+# for this many seconds is dropped from memory and reloaded on next use.
+RAG_SHARD_IDLE_SECONDS = 600
+
+# Cached hotel-info context per normalized guest question; a hotel_info rebuild invalidates it.
+HOTEL_CONTEXT_CACHE_SIZE = 1024
+HOTEL_CONTEXT_CACHE_TTL = 3600  # seconds
+
+# hotel_info.txt is indexed as chunks of at most this many (approximate) tokens,
+# with this much paragraph overlap between neighbours in the same section.
+HOTEL_INFO_CHUNK_TOKENS = 80
+HOTEL_INFO_CHUNK_OVERLAP = 16
+# Token budget for the whole hotel info context in a chat prompt: the top hits
+# first, then the chunks next to them in their sections while it lasts.
+HOTEL_INFO_CONTEXT_TOKENS = 240
 
 
 DEBUG_MODE = False
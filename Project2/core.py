@@ -1,20 +1,48 @@
 import json
 import re
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from config import (
     PERPLEXITY_API_KEY,
     PERPLEXITY_MODEL,
     DEFAULT_NOTIFICATION_TO,
+    HOTEL_CONTEXT_CACHE_SIZE,
+    HOTEL_CONTEXT_CACHE_TTL,
 )
 from services_pms import (
     internal_create_customer,
     create_booking,
     pms_check_availability_pricing,
+    pms_flexible_search,
 )
-from services_rag import BOOKING_STORE, HOTEL_INFO_STORE
+from services_rag import BOOKING_STORE, HOTEL_INFO_STORE, expand_hotel_info
+from query_cache import QueryCache, normalize_query
 import requests
 
 
+# Hotel info answers per normalized question, valid for one HOTEL_INFO_STORE snapshot.
+HOTEL_CONTEXT_CACHE = QueryCache(HOTEL_CONTEXT_CACHE_SIZE, HOTEL_CONTEXT_CACHE_TTL)
+
+
+def get_hotel_context(query):
+    """Hotel info for the chat prompt, within HOTEL_INFO_CONTEXT_TOKENS, cached per snapshot."""
+    # Pick up a snapshot saved by another process, then read only that one:
+    # the cache key, the search and the neighbour chunks all come from it.
+    HOTEL_INFO_STORE.refresh()
+    snapshot = HOTEL_INFO_STORE.snapshot
+    key = normalize_query(query)
+    context = HOTEL_CONTEXT_CACHE.get(key, snapshot.version)
+    if context is not None:
+        return context
+
+    results = HOTEL_INFO_STORE.search(query, top_k=3, snapshot=snapshot)
+    texts = expand_hotel_info(results, snapshot)
+    context = ""
+    if texts:
+        context = "\n\nRelevant Hotel Info:\n" + "\n".join(texts)
+    HOTEL_CONTEXT_CACHE.put(key, snapshot.version, context)
+    return context
+
+
 
 def call_perplexity(prompt, system="You are Nexrova AI assistant.", history=None):
     if not PERPLEXITY_API_KEY:
@@ -116,6 +144,7 @@ def detect_intent(msg, session=None):
             r"\b(register|registration)\b", 
             r"\b(looking|searching).*\b(room|accommodation)",
             r"\bstay.*\bhotel\b",
+            r"\b(will|going to|plan(ning)? to)\s+stay\b",
             r"\b(make|create|do).*\b(booking|reservation)", 
             r"\bplace.*a.*booking\b",
             r"\b(need|want).*\b(room|accommodation|stay)\b", 
@@ -130,6 +159,15 @@ def detect_intent(msg, session=None):
             r"\bi'?ll\s+take\b",
         ],
         
+        "flexible_search": [
+            r"\bcheapest\b.*\b(nights?|stay|dates?|week|weekend)\b",
+            r"\b(first|earliest|soonest|next)\s+available\b",
+            # A stay length plus a window phrase: "within the next 10 days", "sometime next month".
+            r"\b(\d+|a|one|two|three|four|five|six|seven|eight|nine|ten)\s+nights?\b.*" + _WINDOW_PHRASE,
+            _WINDOW_PHRASE + r".*\b(\d+|a|one|two|three|four|five|six|seven|eight|nine|ten)\s+nights?\b",
+            r"\b(flexible|any)\s+dates?\b",
+        ],
+        
         "check_availability": [
             r"\b(check|verify|see|show).*\bavailability\b",
             r"\b(any|do you have).*\bavailable\b",
@@ -192,11 +230,17 @@ def detect_intent(msg, session=None):
             intent_scores["start_booking"] = intent_scores.get("start_booking", 0) + 0.2
     
      
+    # Without a stay length there is nothing to search: treat it as a booking
+    # request, which collects the dates instead of asking for nights again.
+    if "flexible_search" in intent_scores and parse_flexible_search(msg) is None:
+        score = intent_scores.pop("flexible_search")
+        intent_scores["start_booking"] = max(intent_scores.get("start_booking", 0), score)
+
     if intent_scores:
         best_intent = max(intent_scores.items(), key=lambda x: x[1])
         intent, confidence = best_intent
         
-                if confidence >= 0.5:
+        if confidence >= 0.5:
             return intent
     
     
@@ -310,6 +354,56 @@ def regex_fallback_slots(text):
 
 
 
+_NUMBER_WORDS = {
+    "a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_WINDOW_UNITS = {"day": 1, "week": 7, "fortnight": 14, "month": 30}
+_WINDOW_PHRASE = (
+    r"\b(?:(?:within|in|over|during)\s+(?:the\s+)?(?:next|coming)"
+    r"|(?:sometime|some time|anytime|any time)\s+(?:in\s+the\s+)?(?:next|coming|this))"
+    r"\s+(?:(?:\d{1,3}|" + "|".join(_NUMBER_WORDS) + r")\s+)?(?:days?|weeks?|fortnights?|months?)\b"
+)
+
+
+def parse_flexible_search(text):
+    """
+    Stay length, date window, guests and ranking for questions like
+    "cheapest 3 nights in the next month". Returns None without a stay length.
+    """
+    text_lower = text.lower()
+
+    m = re.search(r"\b(\d{1,2}|" + "|".join(_NUMBER_WORDS) + r")\s+nights?\b", text_lower)
+    if not m:
+        return None
+    nights = int(m.group(1)) if m.group(1).isdigit() else _NUMBER_WORDS[m.group(1)]
+
+    slots = regex_fallback_slots(text)
+    window_start = date.today()
+    window_end = window_start + timedelta(days=30)
+    if slots["check_in_date"] and slots["check_out_date"]:
+        window_start, window_end = slots["check_in_date"], slots["check_out_date"]
+    else:
+        w = re.search(
+            r"\b(?:next|within|coming)\s+(?:the\s+)?(\d{1,3}|"
+            + "|".join(_NUMBER_WORDS) + r")?\s*(day|week|fortnight|month)s?\b",
+            text_lower,
+        )
+        if w:
+            count = w.group(1) or "1"
+            count = int(count) if count.isdigit() else _NUMBER_WORDS[count]
+            window_end = window_start + timedelta(days=count * _WINDOW_UNITS[w.group(2)])
+
+    earliest = re.search(r"\b(first|earliest|soonest|next)\s+available\b|\b(earliest|soonest)\b", text_lower)
+    return {
+        "nights": nights,
+        "window_start": str(window_start),
+        "window_end": str(window_end),
+        "guests": slots["guests"] or 1,
+        "sort": "earliest" if earliest else "cheapest",
+    }
+
+
 def handle_chat_logic(message, session):
     
     if "history" not in session:
@@ -432,15 +526,9 @@ def handle_chat_logic(message, session):
     
         
         
-        def get_hotel_context(query):
-            results = HOTEL_INFO_STORE.search(query, top_k=3)
-            if results:
-                return "\n\nRelevant Hotel Info:\n" + "\n".join([r["text"] for r in results])
-            return ""
-
         if intent == "housekeeping":
             ticket = {
-                "id": len(BOOKING_STORE.metadata) + 1,
+                "id": len(BOOKING_STORE) + 1,
                 "text": message,
                 "created_at": datetime.utcnow().isoformat()
             }
@@ -500,6 +588,30 @@ def handle_chat_logic(message, session):
                         msg += f"- Room Type {r['id']}: {r['name']} (${r['total_price']})\n"
                     response = msg + "\nPlease select a room type ID to confirm."
         
+        elif intent == "flexible_search":
+            search = parse_flexible_search(message)
+            if not search:
+                response = "I'd be happy to find the best dates for you. How many nights would you like to stay, and within which dates?"
+            else:
+                options = pms_flexible_search(
+                    search["window_start"],
+                    search["window_end"],
+                    search["nights"],
+                    search["guests"],
+                    sort=search["sort"],
+                )
+                if not options:
+                    response = (
+                        f"Sorry, no rooms are available for {search['nights']} nights between "
+                        f"{search['window_start']} and {search['window_end']}. Please try a different period."
+                    )
+                else:
+                    label = "Earliest" if search["sort"] == "earliest" else "Cheapest"
+                    msg = f"{label} {search['nights']}-night stays for {search['guests']} guest(s):\n"
+                    for o in options:
+                        msg += f"- {o['check_in']} to {o['check_out']}: Room Type {o['id']}: {o['name']} (${o['total_price']})\n"
+                    response = msg + "\nTo book one, tell me your name, email, the dates and number of guests."
+
         elif intent == "check_availability":
             context = get_hotel_context(message)
             availability_prompt = (
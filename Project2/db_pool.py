@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections made by `factory`.
+
+    - Holds between `min_size` (opened on first use) and `max_size` connections;
+      acquire() waits up to `timeout` seconds when all of them are checked out.
+    - A connection idle for more than `ping_after` seconds is pinged on
+      checkout and replaced if the ping fails.
+    - Connections older than `max_lifetime` seconds are closed instead of
+      being reused.
+    - stats() reports checkouts, wait times and utilization.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, timeout=10, max_lifetime=3600, ping_after=30):
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, created_at, released_at)
+        self._born = {}  # id(connection) -> created_at, for connections checked out
+        self._size = 0
+        self._filled = False
+
+        self.checkouts = 0
+        self.created = 0
+        self.closed = 0
+        self.failed_pings = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_in_use = 0
+
+    def _open(self):
+        connection = self.factory()
+        self.created += 1
+        return connection, time.monotonic()
+
+    def _close(self, connection):
+        self.closed += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _fill(self):
+        """Open min_size connections the first time the pool is used."""
+        self._filled = True
+        while self._size < self.min_size:
+            try:
+                connection, created = self._open()
+            except Exception as e:
+                print(f"[DB POOL] could not pre-open connection: {e}")
+                return
+            self._idle.append((connection, created, created))
+            self._size += 1
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            if not self._filled:
+                self._fill()
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"no connection available within {timeout}s")
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                self.waits += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+            if self._idle:
+                connection, created, released = self._idle.pop()
+            else:
+                connection, created, released = None, None, None
+            # Reserve the slot now; the connection is (re)opened outside the lock.
+            if connection is None:
+                self._size += 1
+
+        now = time.monotonic()
+        try:
+            if connection is not None and now - created > self.max_lifetime:
+                self._close(connection)
+                connection = None
+            elif connection is not None and now - released > self.ping_after:
+                try:
+                    connection.ping(reconnect=False)
+                except Exception:
+                    self.failed_pings += 1
+                    self._close(connection)
+                    connection = None
+            if connection is None:
+                connection, created = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._born[id(connection)] = created
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, len(self._born))
+        return connection
+
+    def release(self, connection, broken=False):
+        """Return a connection; broken or expired ones are closed and their slot freed."""
+        with self._cond:
+            created = self._born.pop(id(connection), None)
+            if created is None:
+                return
+            now = time.monotonic()
+            if broken or now - created > self.max_lifetime:
+                self._size -= 1
+                self._close(connection)
+            else:
+                self._idle.append((connection, created, now))
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                connection, _, _ = self._idle.pop()
+                self._size -= 1
+                self._close(connection)
+
+    def stats(self):
+        with self._cond:
+            in_use = len(self._born)
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "utilization": round(in_use / self.max_size, 3),
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "closed": self.closed,
+                "failed_pings": self.failed_pings,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_max * 1000, 3),
+            }
@@ -0,0 +1,203 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Stay well under SQLite's bound-parameter limit for IN (...) lookups.
+_SQL_CHUNK = 500
+# Disk hits are not written back one by one: their last_used stamps are queued
+# and flushed with the next put_many, or once this many (or this old) pile up.
+_TOUCH_BATCH = 512
+_TOUCH_INTERVAL = 30.0
+
+
+def cache_key(model_name: str, text: str):
+    """Stable content address for a (model, text) pair."""
+    return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache: an in-memory LRU in front of a SQLite file.
+
+    Both levels are bounded in MB. The memory level evicts least recently used
+    vectors; the disk level drops the oldest `last_used` rows once it is over
+    budget. Vectors are stored as float32 bytes.
+
+    The file is shared by every worker process, so it can be busy. Any SQLite
+    error on the disk level is logged and treated as a miss (or a skipped
+    write): the cache never fails the embed() call it sits under.
+    """
+
+    def __init__(self, path, disk_mb=512, memory_mb=64, busy_timeout=0.5):
+        self.path = str(path)
+        self.disk_budget = int(disk_mb * 2**20)
+        self.memory_budget = int(memory_mb * 2**20)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._touched = {}  # key -> last_used not yet written to disk
+        self._touched_at = time.monotonic()
+        self.disk_errors = 0
+
+        self._db = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def _remember(self, key, vector):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+        while self._memory_bytes > self.memory_budget and self._memory:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= old.nbytes
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys that are cached."""
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                else:
+                    missing.append(key)
+            self.memory_hits += len(found)
+            missing = list(dict.fromkeys(missing))
+
+            if missing:
+                rows = []
+                try:
+                    for start in range(0, len(missing), _SQL_CHUNK):
+                        chunk = missing[start:start + _SQL_CHUNK]
+                        rows += self._db.execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                        ).fetchall()
+                except sqlite3.Error as e:
+                    self._disk_failed("read", e)
+                    rows = []
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                self.disk_hits += len(rows)
+                self.misses += len(missing) - len(rows)
+
+                if rows:
+                    now = time.time()
+                    self._touched.update((key, now) for key, _ in rows)
+                    if len(self._touched) >= _TOUCH_BATCH or time.monotonic() - self._touched_at > _TOUCH_INTERVAL:
+                        try:
+                            self._flush_touched()
+                            self._db.commit()
+                        except sqlite3.Error as e:
+                            self._disk_failed("touch", e)
+
+        return found
+
+    def _disk_failed(self, action, error):
+        self.disk_errors += 1
+        print(f"[EMBED CACHE] disk {action} skipped: {error}")
+        try:
+            self._db.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _flush_touched(self):
+        """Write queued last_used stamps; the caller commits. Dropped if the write fails."""
+        touched, self._touched = self._touched, {}
+        self._touched_at = time.monotonic()
+        if touched:
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key, now in touched.items()],
+            )
+
+    def put_many(self, items):
+        """Store (key, vector) pairs in both levels and trim the disk file to budget."""
+        now = time.time()
+        rows = []
+
+        with self._lock:
+            for key, vector in items:
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+
+            if not rows:
+                return
+
+            disk_bytes = self._disk_bytes
+            try:
+                self._flush_touched()
+                existing = 0
+                for start in range(0, len(rows), _SQL_CHUNK):
+                    chunk = [r[0] for r in rows[start:start + _SQL_CHUNK]]
+                    existing += self._db.execute(
+                        f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchone()[0]
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+                )
+                self._disk_bytes += sum(len(r[1]) for r in rows) - existing
+
+                if self._disk_bytes > self.disk_budget:
+                    self._evict_disk()
+                self._db.commit()
+            except sqlite3.Error as e:
+                self._disk_bytes = disk_bytes
+                self._disk_failed("write", e)
+
+    def _evict_disk(self):
+        """Drop least recently used rows until the file is back under 90% of budget."""
+        target = int(self.disk_budget * 0.9)
+        cursor = self._db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        doomed = []
+        for key, size in cursor:
+            if self._disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._touched.clear()
+            self._db.execute("DELETE FROM embeddings")
+            self._db.commit()
+            self._disk_bytes = 0
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_errors": self.disk_errors,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_mb": round(self._memory_bytes / 2**20, 2),
+            "disk_mb": round(self._disk_bytes / 2**20, 2),
+        }
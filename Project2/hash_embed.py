@@ -0,0 +1,137 @@
+import numpy as np
+
+# Bumped whenever the features or hashing change, so cached vectors are never mixed.
+NAME = "hashing-v1"
+
+CHAR_NGRAMS = (3, 4)
+CHAR_WEIGHT = 0.5
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 1.0
+
+_SEP = 0
+_SPACE = ord(" ")
+_MAX_WORD = 64
+# Texts hashed per pass; keeps the (chunk, dim) accumulator cache-sized.
+_CHUNK = 512
+
+# Byte classes: lowercase ASCII letters/digits and UTF-8 bytes are word bytes,
+# NUL separates texts, anything else becomes a space.
+_TABLE = np.full(256, _SPACE, dtype=np.uint8)
+_TABLE[_SEP] = _SEP
+for _c in b"abcdefghijklmnopqrstuvwxyz0123456789":
+    _TABLE[_c] = _c
+_TABLE[128:] = np.arange(128, 256, dtype=np.uint8)
+
+# Fixed per-position multipliers for word hashes (legacy RandomState streams never change).
+_POSITION_KEYS = np.random.RandomState(0x5EED).randint(1, 2**62, size=_MAX_WORD, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_PRIME = np.uint64(1099511628211)
+_BIGRAM_KEY = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(h):
+    """splitmix64 finalizer: spreads every input bit over the whole 64-bit hash."""
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def _buffer(texts):
+    """All texts as one normalized byte array, each wrapped as NUL + " text " with runs of spaces collapsed."""
+    joined = "\0 " + " \0 ".join(t.replace("\0", " ") for t in texts).lower() + " \0"
+    buf = _TABLE[np.frombuffer(joined.encode("utf-8"), dtype=np.uint8)]
+    keep = np.ones(buf.shape[0], dtype=bool)
+    keep[1:] = ~((buf[1:] == _SPACE) & (buf[:-1] == _SPACE))
+    return buf[keep]
+
+
+def _char_ngrams(buf, n):
+    """(start positions, hashes) of every n-byte window that stays inside one text."""
+    m = buf.shape[0] - n + 1
+    if m <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+
+    h = np.full(m, n, dtype=np.uint64)
+    ok = np.ones(m, dtype=bool)
+    for k in range(n):
+        window = buf[k:k + m]
+        h = h * _PRIME + window.astype(np.uint64)
+        ok &= window != _SEP
+    starts = np.flatnonzero(ok)
+    return starts, _mix(h[starts])
+
+
+def _words(buf):
+    """(start positions, hashes) of every word, in order."""
+    is_word = (buf != _SPACE) & (buf != _SEP)
+    edges = np.diff(is_word.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if starts.shape[0] == 0:
+        return starts, np.zeros(0, dtype=np.uint64)
+
+    # Offset of each byte inside its word, so a word hash is a keyed segment sum.
+    positions = np.flatnonzero(is_word)
+    word_of = np.repeat(np.arange(starts.shape[0]), ends - starts)
+    offsets = np.minimum(positions - starts[word_of], _MAX_WORD - 1)
+    terms = buf[positions].astype(np.uint64) * _POSITION_KEYS[offsets]
+    sums = np.add.reduceat(terms, np.concatenate(([0], np.cumsum(ends - starts)[:-1])))
+    return starts, _mix(sums + (ends - starts).astype(np.uint64))
+
+
+def embed_texts(texts, dim):
+    """
+    Deterministic feature-hashing embeddings, shape (len(texts), dim), float32, unit rows.
+
+    Features are character 3/4-grams (word edges included), words and adjacent
+    word pairs. Each is hashed to a bucket and a sign, so texts sharing
+    vocabulary or spelling get similar vectors in every process.
+    """
+    texts = list(texts)
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for start in range(0, len(texts), _CHUNK):
+        out[start:start + _CHUNK] = _embed_chunk(texts[start:start + _CHUNK], dim)
+    return out
+
+
+def _embed_chunk(texts, dim):
+    n = len(texts)
+    buf = _buffer(texts)
+    # Text number of every byte (the leading NUL of text i is counted into row i).
+    row_of = np.cumsum(buf == _SEP) - 1
+
+    positions, hashes, weights = [], [], []
+    for size in CHAR_NGRAMS:
+        p, h = _char_ngrams(buf, size)
+        positions.append(p)
+        hashes.append(h)
+        weights.append(np.full(p.shape[0], CHAR_WEIGHT, dtype=np.float32))
+
+    p, h = _words(buf)
+    positions.append(p)
+    hashes.append(h)
+    weights.append(np.full(p.shape[0], WORD_WEIGHT, dtype=np.float32))
+
+    if p.shape[0] > 1:
+        # Pairs of neighbouring words; pairs that straddle two texts are dropped below.
+        same_text = row_of[p[:-1]] == row_of[p[1:]]
+        pair = _mix(h[:-1] * _BIGRAM_KEY ^ h[1:])[same_text]
+        positions.append(p[:-1][same_text])
+        hashes.append(pair)
+        weights.append(np.full(pair.shape[0], BIGRAM_WEIGHT, dtype=np.float32))
+
+    positions = np.concatenate(positions)
+    hashes = np.concatenate(hashes)
+    weights = np.concatenate(weights)
+
+    rows = row_of[positions]
+    # Low 32 bits pick the bucket (multiply-shift range reduction), the top bit the sign.
+    buckets = (((hashes & np.uint64(0xFFFFFFFF)) * np.uint64(dim)) >> np.uint64(32)).astype(np.int64)
+    weights[hashes >= np.uint64(2**63)] *= -1
+
+    out = np.bincount(rows * dim + buckets, weights=weights, minlength=n * dim)
+    out = out.reshape(n, dim).astype(np.float32)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
@@ -0,0 +1,37 @@
+-- Unique (company_id, email) index on the PMS customer table.
+--
+-- internal_create_customer (services_pms.py) uses a single
+-- INSERT ... ON DUPLICATE KEY UPDATE only when this index exists; without it
+-- the app keeps the two-query lookup-then-insert path. The app never creates
+-- the index itself: apply this migration deliberately, against the PMS
+-- database, after checking the points below.
+--
+-- Before applying:
+--   1. The index also binds the PMS's own customer creation. Inserting a
+--      second customer with the same email in a company (including a blank
+--      '' email) will fail with a duplicate-key error. Only apply it if the
+--      PMS stores a missing email as NULL (NULLs never collide) and treats
+--      email as unique per company.
+--   2. Existing duplicates make ALTER TABLE fail. Find them with:
+--
+--        SELECT company_id, email, COUNT(*) AS n
+--        FROM customer
+--        WHERE email IS NOT NULL
+--        GROUP BY company_id, email
+--        HAVING n > 1;
+--
+--      and blank emails (which collide with each other) with:
+--
+--        SELECT COUNT(*) FROM customer WHERE email = '';
+--
+--      Merge or clean them up in the PMS first, e.g. for blanks:
+--
+--        UPDATE customer SET email = NULL WHERE email = '';
+--
+-- After applying, restart the app (or wait up to an hour): the index check
+-- in services_pms is cached.
+--
+-- Rollback:
+--   ALTER TABLE customer DROP INDEX uq_customer_company_email;
+
+ALTER TABLE customer ADD UNIQUE INDEX uq_customer_company_email (company_id, email);
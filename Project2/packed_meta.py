@@ -0,0 +1,118 @@
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = b"NXMETA1\0"
+_HEADER = struct.Struct("<8sQ")
+
+
+class PackedMetadata:
+    """
+    Read-mostly, list-like view of [{"id": ..., "text": ...}] backed by a packed file.
+
+    File layout (little endian):
+        magic (8 bytes) | n (uint64)
+        id offsets   (n + 1 uint64)
+        text offsets (n + 1 uint64)
+        id blob | text blob   (UTF-8, offsets are relative to each blob)
+
+    Nothing is decoded at load time; `meta[i]` decodes one id/text pair on
+    demand. Rows appended after loading are kept in a plain list tail.
+    """
+
+    def __init__(self, buf=None, n=0, id_offsets=None, text_offsets=None, id_start=0, text_start=0):
+        self._buf = buf
+        self._n = n
+        self._id_offsets = id_offsets
+        self._text_offsets = text_offsets
+        self._id_start = id_start
+        self._text_start = text_start
+        self._tail = []
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        with open(path, "rb") as f:
+            if use_mmap:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = f.read()
+
+        magic, n = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a packed metadata file")
+
+        pos = _HEADER.size
+        id_offsets = np.frombuffer(buf, dtype="<u8", count=n + 1, offset=pos)
+        pos += 8 * (n + 1)
+        text_offsets = np.frombuffer(buf, dtype="<u8", count=n + 1, offset=pos)
+        pos += 8 * (n + 1)
+
+        id_start = pos
+        text_start = id_start + int(id_offsets[-1])
+        return cls(buf, n, id_offsets, text_offsets, id_start, text_start)
+
+    @staticmethod
+    def write(file, rows):
+        """Serialize an iterable of {"id", "text"} dicts to an open binary file."""
+        ids = []
+        texts = []
+        for row in rows:
+            ids.append(str(row["id"]).encode("utf-8"))
+            texts.append(str(row["text"]).encode("utf-8"))
+
+        n = len(ids)
+        id_offsets = np.zeros(n + 1, dtype="<u8")
+        text_offsets = np.zeros(n + 1, dtype="<u8")
+        np.cumsum([len(b) for b in ids], out=id_offsets[1:])
+        np.cumsum([len(b) for b in texts], out=text_offsets[1:])
+
+        file.write(_HEADER.pack(MAGIC, n))
+        file.write(id_offsets.tobytes())
+        file.write(text_offsets.tobytes())
+        file.write(b"".join(ids))
+        file.write(b"".join(texts))
+
+    def _decode(self, offsets, start, i):
+        lo = start + int(offsets[i])
+        hi = start + int(offsets[i + 1])
+        return self._buf[lo:hi].decode("utf-8")
+
+    def id(self, i):
+        if i < self._n:
+            return self._decode(self._id_offsets, self._id_start, i)
+        return self._tail[i - self._n]["id"]
+
+    def text(self, i):
+        if i < self._n:
+            return self._decode(self._text_offsets, self._text_start, i)
+        return self._tail[i - self._n]["text"]
+
+    def ids(self):
+        """All ids, decoded in one pass (texts are left alone)."""
+        blob = self._buf[self._id_start:self._text_start]
+        bounds = self._id_offsets.tolist()
+        packed = [blob[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(self._n)]
+        return packed + [row["id"] for row in self._tail]
+
+    def __len__(self):
+        return self._n + len(self._tail)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("metadata index out of range")
+        if i >= self._n:
+            return self._tail[i - self._n]
+        return {"id": self.id(i), "text": self.text(i)}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, row):
+        self._tail.append(row)
+
+    def extend(self, rows):
+        self._tail.extend(rows)
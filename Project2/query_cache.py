@@ -0,0 +1,162 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WORDS = re.compile(r"\w+(?:[.@\-]\w+)*")
+
+
+def normalize_query(query: str):
+    """Lowercased words only, so "WiFi password?" and "wifi  password" share an entry."""
+    return " ".join(_WORDS.findall(query.lower()))
+
+
+class QueryCache:
+    """
+    Bounded LRU of query -> result with a TTL, tagged with the version of the
+    data the result was computed from.
+
+    An entry is only served for the version it was stored with, so publishing
+    a new snapshot invalidates every older entry without an explicit flush.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (version, stored_at, value)
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # entries dropped because their version or TTL ran out
+
+    def get(self, key, version):
+        """The cached value for `key` at `version`, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version and now - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedValue:
+    """
+    One value produced by `loader`, reused for `ttl` seconds.
+
+    The loader runs at most once at a time; concurrent callers wait for its
+    result. If it fails (raises or returns None) the previous value, if any,
+    keeps being served. invalidate() forces the next get() to reload, and
+    start_refresh() reloads on a background thread so callers rarely wait.
+    """
+
+    def __init__(self, loader, ttl=300, name="value"):
+        self.loader = loader
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None
+        self._refresher = None
+        self._stop = threading.Event()
+
+        self.hits = 0
+        self.loads = 0
+        self.failures = 0
+
+    def _fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def get(self):
+        if self._fresh():
+            self.hits += 1
+            return self._value
+        with self._lock:
+            # Another caller may have reloaded while this one waited.
+            if self._fresh():
+                self.hits += 1
+                return self._value
+            self._load()
+            return self._value
+
+    def _load(self):
+        try:
+            value = self.loader()
+        except Exception as e:
+            print(f"[CACHE] {self.name}: reload failed: {e}")
+            value = None
+        self.loads += 1
+        if value is None:
+            self.failures += 1
+            return False
+        self._value = value
+        self._loaded_at = time.monotonic()
+        return True
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def refresh(self):
+        with self._lock:
+            return self._load()
+
+    def start_refresh(self, interval):
+        """Reload every `interval` seconds on a daemon thread (once per cache)."""
+        if self._refresher is not None or not interval:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._refresher = threading.Thread(target=loop, name=f"refresh-{self.name}", daemon=True)
+        self._refresher.start()
+
+    def stop_refresh(self):
+        self._stop.set()
+        self._refresher = None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "loads": self.loads,
+            "failures": self.failures,
+            "ttl": self.ttl,
+            "age_s": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+            "background_refresh": self._refresher is not None,
+        }
@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from services_rag import BUILDERS, build_all_rag, sync_all_rag
+
+MODES = ("incremental", "full")
+
+
+class SyncJob:
+    def __init__(self, mode):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.state = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.coalesced = 0  # later requests folded into this job
+        self.progress = {}  # store -> BuildProgress, filled in while running
+        self.versions = {}  # store -> snapshot version once finished
+        self.result = None
+        self.error = None
+
+    def status(self):
+        stores = {name: p.report() for name, p in list(self.progress.items())}
+        etas = [s["eta_s"] for s in stores.values()]
+        if self.state == "running" and stores and None not in etas:
+            eta = max(etas)
+        else:
+            eta = 0.0 if self.state in ("done", "failed") else None
+
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "state": self.state,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "coalesced": self.coalesced,
+            "rows": sum(s["rows"] for s in stores.values()),
+            "eta_s": eta,
+            "stores": stores,
+            "versions": self.versions,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class SyncJobManager:
+    """
+    Runs RAG syncs on a background thread, one at a time. Jobs in other
+    processes (other gunicorn workers) wait on services_rag.sync_lock.
+
+    submit() returns at once. A request the running job already covers (same
+    mode, or anything during a full rebuild) is coalesced into it. A "full"
+    request during an incremental sync is queued as a single follow-up job
+    that any further requests join.
+    """
+
+    HISTORY = 20  # finished jobs kept for status lookups
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = None
+        self.pending = None
+        self.jobs = OrderedDict()
+
+    def submit(self, mode="incremental"):
+        """Returns (job, coalesced)."""
+        if mode not in MODES:
+            raise ValueError(f"unknown sync mode: {mode}")
+
+        with self._lock:
+            running = self.running
+            if running is None:
+                return self._start(self._remember(SyncJob(mode))), False
+
+            if running.mode == "full" or mode == running.mode:
+                running.coalesced += 1
+                return running, True
+
+            if self.pending is None:
+                self.pending = self._remember(SyncJob(mode))
+                return self.pending, False
+            self.pending.coalesced += 1
+            return self.pending, True
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.HISTORY:
+            oldest = next(iter(self.jobs))
+            if self.jobs[oldest] in (self.running, self.pending):
+                break
+            self.jobs.pop(oldest)
+        return job
+
+    def _start(self, job):
+        job.state = "running"
+        job.started_at = time.time()
+        self.running = job
+        threading.Thread(target=self._run, args=(job,), name=f"rag-sync-{job.id}", daemon=True).start()
+        return job
+
+    def _run(self, job):
+        print(f"[RAG SYNC] job {job.id} ({job.mode}) started")
+        try:
+            if job.mode == "full":
+                job.result = build_all_rag(progress=job.progress)
+            else:
+                job.result = sync_all_rag(progress=job.progress)
+            job.state = "done"
+        except Exception as e:
+            print(f"[RAG SYNC] job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+
+        job.versions = {name: store.version for name, (store, _) in BUILDERS.items()}
+        job.finished_at = time.time()
+        print(f"[RAG SYNC] job {job.id} {job.state} in {job.finished_at - job.started_at:.1f}s")
+
+        with self._lock:
+            self.running = None
+            if self.pending is not None:
+                follow_up, self.pending = self.pending, None
+                self._start(follow_up)
+
+    def get(self, job_id=None):
+        """A job by id, or else the running one, else the queued one, else the latest."""
+        with self._lock:
+            if job_id is not None:
+                return self.jobs.get(job_id)
+            if self.running is not None:
+                return self.running
+            if self.pending is not None:
+                return self.pending
+            return next(reversed(self.jobs.values()), None)
+
+
+SYNC_JOBS = SyncJobManager()
@@ -0,0 +1,160 @@
+from datetime import date
+
+import numpy as np
+
+from availability import to_date
+
+
+def _season_mask(days, season):
+    """Boolean mask over `days` (datetime64[D]) for one season rule."""
+    start, end = season["start"], season["end"]
+    if isinstance(start, str) and len(start) == 5:
+        # Recurring "MM-DD" range, inclusive; may wrap over new year ("12-20" .. "01-05").
+        months = days.astype("datetime64[M]")
+        month_day = (months.astype(int) % 12 + 1) * 100 + (days - months).astype(int) + 1
+        start, end = int(start.replace("-", "")), int(end.replace("-", ""))
+        if start <= end:
+            mask = (month_day >= start) & (month_day <= end)
+        else:
+            mask = (month_day >= start) | (month_day <= end)
+    else:
+        mask = (days >= np.datetime64(to_date(start))) & (days <= np.datetime64(to_date(end)))
+
+    weekdays = season.get("weekdays")
+    if weekdays:
+        # datetime64 day 0 (1970-01-01) was a Thursday; 0 = Monday as in date.weekday().
+        mask &= np.isin((days.astype(int) + 3) % 7, list(weekdays))
+    return mask
+
+
+class RateCalendar:
+    """
+    Nightly rates as a (room_type x night) array from `origin`, plus its
+    running sum along the nights, so the room charge of any stay for every
+    room type is prefix[:, check_out] - prefix[:, check_in].
+
+    rules:
+        default_rate     rate for room types without their own base rate
+        base_rates       {room_type_id: nightly rate}
+        seasons          [{"start", "end", "rate" or "multiplier",
+                           optional "room_type_id", optional "weekdays"}];
+                         "start"/"end" are dates (inclusive) or recurring
+                         "MM-DD"; later seasons override earlier ones
+        extra_guest_fee  per night per guest above the type's max_adults
+        long_stay        [(min_nights, factor)], best matching tier applies
+    """
+
+    def __init__(self, origin, type_ids, nightly, rules):
+        self.origin = to_date(origin)
+        self.type_ids = np.asarray(type_ids, dtype=np.int64)
+        self._col = {int(t): i for i, t in enumerate(self.type_ids)}
+        self.nightly = nightly
+        self.prefix = np.zeros((nightly.shape[0], nightly.shape[1] + 1), dtype=np.float64)
+        np.cumsum(nightly, axis=1, out=self.prefix[:, 1:])
+        self.extra_guest_fee = float(rules.get("extra_guest_fee", 0.0))
+        tiers = sorted(rules.get("long_stay", ()), reverse=True)
+        self.long_stay_nights = np.array([n for n, _ in tiers], dtype=np.int64)
+        self.long_stay_factors = np.array([f for _, f in tiers], dtype=np.float64)
+
+    @classmethod
+    def build(cls, type_ids, rules, origin=None, horizon_days=730):
+        origin = to_date(origin or date.today())
+        type_ids = [int(t) for t in type_ids]
+        days = np.datetime64(origin) + np.arange(horizon_days)
+
+        base = rules.get("base_rates", {})
+        default = float(rules.get("default_rate", 0.0))
+        nightly = np.empty((len(type_ids), horizon_days), dtype=np.float64)
+        for i, t in enumerate(type_ids):
+            nightly[i] = float(base.get(t, default))
+
+        rows = {t: i for i, t in enumerate(type_ids)}
+        for season in rules.get("seasons", ()):
+            mask = _season_mask(days, season)
+            target = season.get("room_type_id")
+            if target is not None and int(target) not in rows:
+                continue
+            selected = slice(None) if target is None else rows[int(target)]
+            if "rate" in season:
+                nightly[selected, mask] = float(season["rate"])
+            else:
+                nightly[selected, mask] *= float(season.get("multiplier", 1.0))
+
+        return cls(origin, type_ids, nightly, rules)
+
+    @property
+    def horizon(self):
+        return self.nightly.shape[1]
+
+    def base_rate(self, room_type_id, on=None):
+        """Nightly rate of one room type on a date (default: today); None if out of range."""
+        col = self._col.get(int(room_type_id))
+        offset = (to_date(on or date.today()) - self.origin).days
+        if col is None or not 0 <= offset < self.horizon:
+            return None
+        return float(self.nightly[col, offset])
+
+    def offset(self, day):
+        """Night index of `day` in the calendar (negative before origin)."""
+        return (to_date(day) - self.origin).days
+
+    def _offsets(self, dates):
+        dates = np.asarray([np.datetime64(to_date(d)) for d in dates], dtype="datetime64[D]")
+        return (dates - np.datetime64(self.origin)).astype(np.int64)
+
+    def quote_offsets(self, starts, ends, guests=None, max_adults=None):
+        """
+        Vectorized pricing of stays given as night offsets from origin.
+        Returns (totals, nights): totals is (stays x room types), NaN where the
+        stay is empty or outside the calendar; columns follow self.type_ids.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        valid = (starts >= 0) & (ends > starts) & (ends <= self.horizon)
+        s = np.where(valid, starts, 0)
+        e = np.where(valid, ends, 0)
+        nights = (e - s).astype(np.float64)
+
+        totals = (self.prefix[:, e] - self.prefix[:, s]).T
+
+        if guests is not None and max_adults is not None and self.extra_guest_fee:
+            extra = np.maximum(np.asarray(guests, dtype=np.float64).reshape(-1, 1)
+                               - np.asarray(max_adults, dtype=np.float64).reshape(1, -1), 0)
+            totals = totals + extra * self.extra_guest_fee * nights[:, None]
+
+        if len(self.long_stay_nights):
+            # Tiers are sorted longest first, so the first match is the best one.
+            choices = [(nights >= n)[:, None] for n in self.long_stay_nights]
+            factor = np.select(choices, [np.full((1, 1), f) for f in self.long_stay_factors], 1.0)
+            totals = totals * factor
+
+        totals[~valid] = np.nan
+        return totals, nights.astype(np.int64)
+
+    def quote_types(self, room_type_ids, starts, ends, guests=None, max_adults=None):
+        """
+        quote_offsets restricted to `room_type_ids`, with columns in that order
+        and max_adults aligned to them; types missing from the calendar are NaN.
+        """
+        cols = np.array([self._col.get(int(t), -1) for t in room_type_ids], dtype=np.int64)
+        known = cols >= 0
+        adults = None
+        if max_adults is not None:
+            adults = np.zeros(len(self.type_ids))
+            adults[cols[known]] = np.asarray(max_adults, dtype=np.float64)[known]
+        totals, _ = self.quote_offsets(starts, ends, guests, adults)
+        totals = totals[:, np.maximum(cols, 0)]
+        totals[:, ~known] = np.nan
+        return totals
+
+    def quote_many(self, check_ins, check_outs, guests=None, max_adults=None):
+        """Like quote_offsets, for lists of check-in / check-out dates."""
+        return self.quote_offsets(self._offsets(check_ins), self._offsets(check_outs), guests, max_adults)
+
+    def quote(self, check_in, check_out, guests=None, max_adults=None):
+        """{room_type_id: total} for one stay (empty if it is outside the calendar)."""
+        totals, _ = self.quote_many([check_in], [check_out], None if guests is None else [guests], max_adults)
+        row = totals[0]
+        if np.isnan(row).all():
+            return {}
+        return {int(t): round(float(v), 2) for t, v in zip(self.type_ids, row)}
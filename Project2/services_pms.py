@@ -1,74 +1,210 @@
 
+import os
+import random
+import threading
+import time
+import numpy as np
 import pymysql
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from config import (
     MYSQL_HOST,
     MYSQL_PORT,
     MYSQL_USER,
     MYSQL_PASSWORD,
     MYSQL_DATABASE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_LIFETIME,
+    DB_POOL_PING_AFTER,
+    ROOM_TYPE_CACHE_TTL,
+    ROOM_TYPE_REFRESH_INTERVAL,
+    AVAILABILITY_RELOAD_INTERVAL,
+    BOOKING_LOCK_RETRIES,
+    BOOKING_RETRY_BACKOFF,
+    CUSTOMER_CACHE_SIZE,
+    CUSTOMER_CACHE_TTL,
+    CUSTOMER_CACHE_STAMP,
+    CUSTOMER_CREATE_EMAIL_INDEX,
+    RATE_DEFAULT_NIGHTLY,
+    RATE_EXTRA_GUEST_FEE,
+    RATE_LONG_STAY_DISCOUNTS,
+    RATE_SEASONS,
+    RATE_HORIZON_DAYS,
+    RATE_RELOAD_INTERVAL,
 )
+from db_pool import ConnectionPool
+from query_cache import CachedValue, QueryCache
+from availability import MAX_HORIZON_DAYS, OccupancyIndex, to_date
+from rates import RateCalendar
+
+
+def _connect(autocommit=False):
+    return pymysql.connect(
+        host=MYSQL_HOST,
+        port=MYSQL_PORT,
+        user=MYSQL_USER,
+        password=MYSQL_PASSWORD,
+        database=MYSQL_DATABASE,
+        charset='utf8mb4',
+        cursorclass=pymysql.cursors.DictCursor,
+        autocommit=autocommit
+    )
 
 
 def get_db_connection():
-    """Create and return a MySQL database connection"""
+    """Create and return a dedicated (unpooled) MySQL database connection"""
     try:
-        connection = pymysql.connect(
-            host=MYSQL_HOST,
-            port=MYSQL_PORT,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database=MYSQL_DATABASE,
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        return connection
+        return _connect()
     except Exception as e:
         print(f"[DB CONNECTION ERROR] {e}")
         return None
 
 
+# Pooled connections run in autocommit, so a reused connection never reads from a
+# stale transaction snapshot; transactions are opened explicitly with begin().
+DB_POOL = ConnectionPool(
+    lambda: _connect(autocommit=True),
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_lifetime=DB_POOL_MAX_LIFETIME,
+    ping_after=DB_POOL_PING_AFTER,
+)
+
+_session = threading.local()
+
+# MySQL "lock wait timeout exceeded" and "deadlock found": the transaction can simply be retried.
+_LOCK_ERRORS = (1205, 1213)
+
+
+def _is_lock_conflict(error):
+    return isinstance(error, pymysql.err.OperationalError) and bool(error.args) and error.args[0] in _LOCK_ERRORS
+
+
+@contextmanager
+def db_session():
+    """
+    Check out one pooled connection for a unit of work. execute_query and
+    execute_insert calls inside the block (on this thread) reuse it instead of
+    checking out their own; nested db_session blocks share the outer one.
+    """
+    connection = getattr(_session, "connection", None)
+    if connection is not None:
+        yield connection
+        return
+
+    connection = DB_POOL.acquire()
+    _session.connection = connection
+    broken = False
+    try:
+        yield connection
+    except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+        # A lock conflict leaves the connection usable; anything else may not.
+        broken = not _is_lock_conflict(e)
+        raise
+    finally:
+        _session.connection = None
+        DB_POOL.release(connection, broken=broken)
+
+
+@contextmanager
+def db_transaction():
+    """
+    One explicit transaction on the session's pooled connection: committed
+    when the block exits normally, rolled back if it raises.
+    """
+    with db_session() as connection:
+        connection.begin()
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+
+def db_pool_stats():
+    return DB_POOL.stats()
+
+
 def execute_query(query, params=None):
     """Execute a SELECT query and return results"""
-    connection = get_db_connection()
-    if not connection:
-        return None
-    
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(query, params or ())
-            results = cursor.fetchall()
-        return results
+        with db_session() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params or ())
+                results = cursor.fetchall()
+            return results
     except Exception as e:
         print(f"[DB QUERY ERROR] {e}")
         return None
+
+
+def stream_query(query, params=None, chunk_size=1000):
+    """
+    Execute a SELECT query through an unbuffered server-side cursor and yield
+    the rows in lists of up to chunk_size, so a large table is never held in
+    memory at once. Unlike execute_query, errors are raised: a stream that
+    stops halfway must not be mistaken for a complete result.
+    """
+    # A dedicated connection: a long unbuffered read should not hold a pool slot.
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("database connection failed")
+
+    try:
+        with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
     finally:
         connection.close()
 
 
 def execute_insert(query, params=None):
     """Execute an INSERT query and return the last inserted ID"""
-    connection = get_db_connection()
-    if not connection:
-        return None
-    
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(query, params or ())
-            connection.commit()
-            return cursor.lastrowid
+        with db_session() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                    connection.commit()
+                    return cursor.lastrowid
+            except Exception:
+                connection.rollback()
+                raise
     except Exception as e:
         print(f"[DB INSERT ERROR] {e}")
-        connection.rollback()
         return None
-    finally:
-        connection.close()
 
 
-def get_room_types():
+def execute_update(query, params=None):
+    """Execute an UPDATE/DELETE query and return the number of rows it changed"""
+    try:
+        with db_session() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                    connection.commit()
+                    return cursor.rowcount
+            except Exception:
+                connection.rollback()
+                raise
+    except Exception as e:
+        print(f"[DB UPDATE ERROR] {e}")
+        return None
+
+
+def _fetch_room_types():
     """
     Fetch all room types from Minical database.
-    Returns list of room types with id, name, and base price information.
+    Returns list of room types with id, name, and base price information,
+    or None if the query failed.
     """
     try:
         
@@ -93,6 +229,8 @@ def get_room_types():
         
         results = execute_query(query)
         
+        if results is None:
+            return None
         if not results:
             print("[ROOM TYPES] No room types found in database")
             return []
@@ -103,7 +241,7 @@ def get_room_types():
             room_type = {
                 "id": row["id"],
                 "name": row["name"],
-                "base_price": 100.00,  
+                "base_price": RATE_DEFAULT_NIGHTLY,
                 "max_occupancy": row["max_occupancy"] or 2,
                 "max_adults": row["max_adults"] or 2,
                 "max_children": row["max_children"] or 0,
@@ -117,27 +255,247 @@ def get_room_types():
         
     except Exception as e:
         print(f"[ERROR] Failed to fetch room types: {e}")
+        return None
+
+
+# Room types change rarely; availability checks and RAG builds read this cached catalog.
+ROOM_TYPE_CATALOG = CachedValue(_fetch_room_types, ttl=ROOM_TYPE_CACHE_TTL, name="room_types")
+
+
+def get_room_types():
+    """
+    Room types from the in-process catalog cache (refetched after
+    ROOM_TYPE_CACHE_TTL seconds or invalidate_room_types()), with
+    base_price set to today's rate from the rate calendar.
+    Returns a fresh list of dicts, so callers may modify the result.
+    """
+    rows = ROOM_TYPE_CATALOG.get()
+    if not rows:
         return []
+    calendar = get_rate_calendar()
+    room_types = []
+    for row in rows:
+        room_type = dict(row)
+        rate = calendar.base_rate(row["id"]) if calendar is not None else None
+        if rate is not None:
+            room_type["base_price"] = rate
+        room_types.append(room_type)
+    return room_types
 
 
-def internal_create_customer(firstname, lastname, email, phone):
+def invalidate_room_types():
+    """Call after room types or room inventory change; the next read refetches."""
+    ROOM_TYPE_CATALOG.invalidate()
+    RATE_CALENDAR.invalidate()
+
+
+def start_room_type_refresh(interval=ROOM_TYPE_REFRESH_INTERVAL):
+    """Keep the catalog warm from a background thread (no-op when interval is 0)."""
+    ROOM_TYPE_CATALOG.start_refresh(interval)
+
+
+def room_type_cache_stats():
+    return ROOM_TYPE_CATALOG.stats()
+
+
+def _fetch_rate_rules():
     """
-    Create a customer in Minical database.
-    Returns customer_id on success, None on failure.
+    Pricing rules for the rate calendar: the config defaults, with the
+    per-room-type rates of the PMS rate plans (rate_plan -> rate ->
+    date_range) applied first so RATE_SEASONS adjustments stack on top.
     """
+    rules = {
+        "default_rate": RATE_DEFAULT_NIGHTLY,
+        "base_rates": {},
+        "seasons": [],
+        "extra_guest_fee": RATE_EXTRA_GUEST_FEE,
+        "long_stay": list(RATE_LONG_STAY_DISCOUNTS),
+    }
+    rows = execute_query("""
+        SELECT rp.room_type_id, r.base_rate, dr.date_start, dr.date_end
+        FROM rate_plan rp
+        JOIN rate r ON r.rate_plan_id = rp.rate_plan_id
+        JOIN date_range_x_rate drx ON drx.rate_id = r.rate_id
+        JOIN date_range dr ON dr.date_range_id = drx.date_range_id
+        WHERE (rp.is_deleted IS NULL OR rp.is_deleted = 0)
+        ORDER BY dr.date_start
+    """)
+    if rows is None:
+        print("[RATES] PMS rate plans unavailable, using default rates")
+        rows = []
+
+    for row in rows:
+        if row["base_rate"] is None:
+            continue
+        if row["date_start"] is None and row["date_end"] is None:
+            rules["base_rates"][row["room_type_id"]] = float(row["base_rate"])
+            continue
+        rules["seasons"].append({
+            "room_type_id": row["room_type_id"],
+            "start": row["date_start"] or "1970-01-01",
+            "end": row["date_end"] or "9999-12-31",
+            "rate": float(row["base_rate"]),
+        })
+    rules["seasons"].extend(RATE_SEASONS)
+    return rules
+
+
+def _load_rate_calendar():
+    room_types = ROOM_TYPE_CATALOG.get()
+    if not room_types:
+        return None
+    calendar = RateCalendar.build(
+        [rt["id"] for rt in room_types], _fetch_rate_rules(), horizon_days=RATE_HORIZON_DAYS
+    )
+    print(f"[RATES] Rate calendar: {len(calendar.type_ids)} room types x {calendar.horizon} nights")
+    return calendar
+
+
+# Rebuilt every RATE_RELOAD_INTERVAL seconds (which also moves its origin to today).
+RATE_CALENDAR = CachedValue(_load_rate_calendar, ttl=RATE_RELOAD_INTERVAL, name="rate_calendar")
+
+
+def get_rate_calendar():
+    """The rate calendar, or None if it could not be built."""
+    return RATE_CALENDAR.get()
+
+
+def invalidate_rates():
+    """Call after rate plans change; the next quote rebuilds the calendar."""
+    RATE_CALENDAR.invalidate()
+
+
+def rate_calendar_stats():
+    return RATE_CALENDAR.stats()
+
+
+def _load_occupancy():
+    """Occupancy bitmap of sellable rooms from their current and future booking blocks."""
+    rooms = execute_query(
+        "SELECT room_id, room_type_id FROM room WHERE is_deleted = 0 AND can_be_sold_online = 1"
+    )
+    stays = execute_query("""
+        SELECT bb.room_id, bb.check_in_date, bb.check_out_date
+        FROM booking_block bb
+        JOIN booking b ON b.booking_id = bb.booking_id
+        WHERE b.is_deleted = 0 AND bb.check_out_date > CURDATE()
+    """)
+    if rooms is None or stays is None:
+        return None
+
+    index = OccupancyIndex.build(
+        [(r["room_id"], r["room_type_id"]) for r in rooms],
+        [(s["room_id"], s["check_in_date"], s["check_out_date"]) for s in stays],
+    )
+    print(f"[AVAILABILITY] Indexed {len(index)} rooms, {len(stays)} stays")
+    return index
+
+
+# Reloaded from MySQL every AVAILABILITY_RELOAD_INTERVAL seconds (picking up bookings
+# made elsewhere); bookings made through create_booking are applied immediately.
+OCCUPANCY = CachedValue(_load_occupancy, ttl=AVAILABILITY_RELOAD_INTERVAL, name="occupancy")
+
+
+def get_occupancy_index():
+    """The in-memory occupancy index, or None if it could not be loaded."""
+    return OCCUPANCY.get()
+
+
+def invalidate_occupancy():
+    OCCUPANCY.invalidate()
+
+
+def free_rooms(room_type_id, check_in, check_out):
+    """Room ids of a type free for [check_in, check_out), or None if the index is unavailable."""
+    index = get_occupancy_index()
+    if index is None:
+        return None
+    return index.free_rooms(room_type_id, check_in, check_out)
+
+
+def _customer_key(company_id, email):
+    """Cache key for an email (MySQL compares emails case-insensitively too); None if blank."""
+    email = (email or "").strip().lower()
+    return (company_id, email) if email else None
+
+
+def _has_unique_email_index():
+    """True if customer has a unique index on (company_id, email) or on email alone."""
+    rows = execute_query("""
+        SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columns
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'customer' AND NON_UNIQUE = 0
+        GROUP BY INDEX_NAME
+    """)
+    if rows is None:
+        return None
+    return any(row["columns"] in ("email", "company_id,email") for row in rows)
+
+
+# Known emails skip the database entirely; entries are tagged with _customer_generation().
+CUSTOMER_IDS = QueryCache(CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL)
+CUSTOMER_EMAIL_UNIQUE = CachedValue(_has_unique_email_index, ttl=3600, name="customer_email_index")
+
+
+def ensure_customer_email_index():
+    """
+    Add the unique (company_id, email) index the upsert needs, when
+    CUSTOMER_CREATE_EMAIL_INDEX allows it. Never called implicitly; the
+    documented route is migrations/001_customer_company_email_unique.sql.
+    Without the index, internal_create_customer keeps using the
+    select-then-insert path.
+    """
+    if not CUSTOMER_CREATE_EMAIL_INDEX or CUSTOMER_EMAIL_UNIQUE.get() is not False:
+        return
     try:
-        
-        check_query = "SELECT customer_id FROM customer WHERE email = %s LIMIT 1"
-        existing = execute_query(check_query, (email,))
-        
-        if existing and len(existing) > 0:
+        with db_session() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "ALTER TABLE customer ADD UNIQUE INDEX uq_customer_company_email (company_id, email)"
+                )
+        print("[CUSTOMER] Added unique index on customer (company_id, email)")
+    except Exception as e:
+        print(f"[CUSTOMER] Could not add unique email index, upsert disabled: {e}")
+    CUSTOMER_EMAIL_UNIQUE.invalidate()
+
+
+def _customer_generation():
+    """
+    CUSTOMER_IDS version shared by every worker: the mtime of CUSTOMER_CACHE_STAMP,
+    which invalidate_customer moves forward.
+    """
+    try:
+        return os.stat(CUSTOMER_CACHE_STAMP).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _insert_customer(full_name, email, phone):
+    """
+    The pre-upsert path: look the email up, insert if missing (two round trips).
+    A customer soft-deleted under this email is restored, as the upsert does.
+    """
+    with db_session():
+        existing = execute_query(
+            "SELECT customer_id, is_deleted FROM customer WHERE email = %s ORDER BY is_deleted LIMIT 1",
+            (email,),
+        )
+        if existing is None:
+            return None
+        if existing:
             customer_id = existing[0]["customer_id"]
+            if existing[0]["is_deleted"]:
+                restored = execute_update(
+                    "UPDATE customer SET customer_name = %s, phone = %s, is_deleted = 0 WHERE customer_id = %s",
+                    (full_name, phone or "", customer_id),
+                )
+                if restored is None:
+                    return None
+                print(f"[CUSTOMER] Restored deleted customer: {customer_id}")
+                return customer_id
             print(f"[CUSTOMER] Found existing customer: {customer_id}")
             return customer_id
-        
-    
-        full_name = f"{firstname} {lastname}".strip()
-        insert_query = """
+        return execute_insert("""
             INSERT INTO customer (
                 customer_name, 
                 email, 
@@ -145,74 +503,200 @@ def internal_create_customer(firstname, lastname, email, phone):
                 company_id,
                 is_deleted
             ) VALUES (%s, %s, %s, %s, %s)
-        """
-        
-        customer_id = execute_insert(
-            insert_query, 
-            (full_name, email, phone or "", 1, 0)
-        )
-        
+        """, (full_name, email, phone or "", 1, 0))
+
+
+def internal_create_customer(firstname, lastname, email, phone):
+    """
+    Create a customer in Minical database, or find the one with this email.
+    Returns customer_id on success, None on failure.
+
+    Repeat emails are answered from CUSTOMER_IDS without a query. Otherwise a
+    single INSERT ... ON DUPLICATE KEY UPDATE creates the customer or returns
+    the existing id (LAST_INSERT_ID(customer_id)). An email that only belongs to
+    a soft-deleted customer restores that row with the new name and phone: the
+    unique (company_id, email) index leaves no room for a second customer.
+    """
+    key = _customer_key(1, email)
+    # Read before the database, so an invalidation racing this call makes the entry stale.
+    generation = _customer_generation()
+    if key is not None:
+        customer_id = CUSTOMER_IDS.get(key, generation)
+        if customer_id is not None:
+            print(f"[CUSTOMER] Known customer: {customer_id}")
+            return customer_id
+
+    try:
+        full_name = f"{firstname} {lastname}".strip()
+        email = (email or "").strip() or None
+
+        if key is not None and CUSTOMER_EMAIL_UNIQUE.get():
+            customer_id = execute_insert("""
+                INSERT INTO customer (
+                    customer_name, 
+                    email, 
+                    phone, 
+                    company_id,
+                    is_deleted
+                ) VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    customer_name = IF(is_deleted = 1, VALUES(customer_name), customer_name),
+                    phone = IF(is_deleted = 1, VALUES(phone), phone),
+                    is_deleted = 0,
+                    customer_id = LAST_INSERT_ID(customer_id)
+            """, (full_name, email, phone or "", 1, 0))
+            # Assignments run left to right: name and phone see the old is_deleted.
+        else:
+            customer_id = _insert_customer(full_name, email, phone)
+
         if customer_id:
-            print(f"[CUSTOMER] Created new customer: {customer_id}")
+            print(f"[CUSTOMER] Customer ready: {customer_id}")
+            if key is not None:
+                CUSTOMER_IDS.put(key, generation, customer_id)
             return customer_id
         else:
             print("[CUSTOMER] Failed to create customer")
             return None
-            
+
     except Exception as e:
         print(f"[ERROR] Failed to create customer: {e}")
         return None
 
 
+def invalidate_customer(customer_id):
+    """
+    Empty the email cache of every worker sharing CUSTOMER_CACHE_STAMP; call
+    after a customer is soft-deleted or its email changes. Deletes are rare,
+    so all entries go rather than just `customer_id`'s.
+    """
+    CUSTOMER_IDS.clear()
+    try:
+        os.makedirs(os.path.dirname(CUSTOMER_CACHE_STAMP) or ".", exist_ok=True)
+        with open(CUSTOMER_CACHE_STAMP, "a"):
+            pass
+        # Strictly forward, even when two invalidations land in the same clock tick.
+        stamp = max(time.time_ns(), _customer_generation() + 1)
+        os.utime(CUSTOMER_CACHE_STAMP, ns=(stamp, stamp))
+    except OSError as e:
+        print(f"[CUSTOMER] Other workers keep customer {customer_id} cached up to {CUSTOMER_CACHE_TTL}s: {e}")
+
+
+def soft_delete_customer(customer_id):
+    """
+    Mark a customer deleted and drop it from the email caches. Returns True on
+    success, False if no live customer has this id, None if the update failed.
+    """
+    with db_session():
+        updated = execute_update(
+            "UPDATE customer SET is_deleted = 1 WHERE customer_id = %s AND is_deleted = 0", (customer_id,)
+        )
+        if updated:
+            invalidate_customer(customer_id)
+    if updated is None:
+        print(f"[CUSTOMER] Failed to delete customer {customer_id}")
+        return None
+    if not updated:
+        print(f"[CUSTOMER] No live customer {customer_id} to delete")
+        return False
+    print(f"[CUSTOMER] Soft-deleted customer {customer_id}")
+    return True
+
+
+def customer_cache_stats():
+    return CUSTOMER_IDS.stats()
+
+
+def _book_room(cursor, customer_id, room_type_id, check_in, check_out, preferred=()):
+    """
+    Inside an open transaction: lock the sellable rooms of the type, pick one
+    with no stay overlapping [check_in, check_out) (rooms in `preferred`
+    first) and insert the booking and its booking_block.
+    Returns (booking_id, room_id), or None if every room is taken.
+    """
+    # Every booking of this type takes the same row locks, in room_id order, so
+    # concurrent bookings queue here instead of both picking the same room.
+    cursor.execute("""
+        SELECT room_id FROM room
+        WHERE room_type_id = %s
+            AND is_deleted = 0
+            AND can_be_sold_online = 1
+        ORDER BY room_id
+        FOR UPDATE
+    """, (room_type_id,))
+    rooms = [row["room_id"] for row in cursor.fetchall()]
+    if not rooms:
+        return None
+
+    placeholders = ", ".join(["%s"] * len(rooms))
+    cursor.execute(f"""
+        SELECT DISTINCT bb.room_id
+        FROM booking_block bb
+        JOIN booking b ON b.booking_id = bb.booking_id
+        WHERE bb.room_id IN ({placeholders})
+            AND b.is_deleted = 0
+            AND bb.check_in_date < %s
+            AND bb.check_out_date > %s
+    """, (*rooms, check_out, check_in))
+    taken = {row["room_id"] for row in cursor.fetchall()}
+
+    free = [r for r in rooms if r not in taken]
+    if not free:
+        return None
+    preferred = set(preferred)
+    room_id = next((r for r in free if r in preferred), free[0])
+
+    cursor.execute("""
+        INSERT INTO booking (
+            booking_customer_id,
+            company_id,
+            is_deleted
+        ) VALUES (%s, %s, %s)
+    """, (customer_id, 1, 0))
+    booking_id = cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO booking_block (booking_id, room_id, check_in_date, check_out_date)
+        VALUES (%s, %s, %s, %s)
+    """, (booking_id, room_id, check_in, check_out))
+    return booking_id, room_id
+
+
 def create_booking(customer_id, room_type_id, check_in, check_out):
     """
     Create a booking in Minical database.
     Returns booking_id on success, None on failure.
+
+    Runs as one transaction on one pooled connection (see _book_room), so two
+    guests booking the same room type at once can never get the same room.
+    Lock wait timeouts and deadlocks are retried with exponential backoff.
     """
-    try:
-        
-        room_query = """
-            SELECT room_id FROM room 
-            WHERE room_type_id = %s 
-                AND is_deleted = 0
-                AND can_be_sold_online = 1
-            LIMIT 1
-        """
-        
-        available_rooms = execute_query(room_query, (room_type_id,))
-        
-        if not available_rooms or len(available_rooms) == 0:
-            print(f"[BOOKING] No available rooms for type {room_type_id}")
-            return None
-        
-        room_id = available_rooms[0]["room_id"]
-        
-       
-        insert_query = """
-            INSERT INTO booking (
-                booking_customer_id,
-                company_id,
-                is_deleted
-            ) VALUES (%s, %s, %s)
-        """
-        
-        booking_id = execute_insert(
-            insert_query,
-            (customer_id, 1, 0)
-        )
-        
-        if booking_id:
-            print(f"[BOOKING] Created booking: {booking_id}")
-            
-            return booking_id
-        else:
-            print("[BOOKING] Failed to create booking")
-            return None
-            
-    except Exception as e:
-        print(f"[ERROR] Failed to create booking: {e}")
+    # The occupancy index only suggests rooms; the locked query has the final say.
+    index = get_occupancy_index()
+    preferred = index.free_rooms(room_type_id, check_in, check_out) if index is not None else []
+
+    for attempt in range(BOOKING_LOCK_RETRIES + 1):
+        try:
+            with db_transaction() as connection:
+                with connection.cursor() as cursor:
+                    booked = _book_room(cursor, customer_id, room_type_id, check_in, check_out, preferred)
+            break
+        except Exception as e:
+            if not _is_lock_conflict(e) or attempt == BOOKING_LOCK_RETRIES:
+                print(f"[ERROR] Failed to create booking: {e}")
+                return None
+            delay = BOOKING_RETRY_BACKOFF * (2 ** attempt) * (1 + random.random())
+            print(f"[BOOKING] Lock conflict ({e.args[0]}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+    if booked is None:
+        print(f"[BOOKING] No available rooms for type {room_type_id}")
         return None
 
+    booking_id, room_id = booked
+    if index is not None:
+        index.book(room_id, check_in, check_out)
+    print(f"[BOOKING] Created booking: {booking_id} (room {room_id})")
+    return booking_id
+
 
 def pms_check_availability_pricing(check_in, check_out, guests):
     """
@@ -236,6 +720,20 @@ def pms_check_availability_pricing(check_in, check_out, guests):
             print("[AVAILABILITY] No room types available")
             return []
         
+        # Rooms per type free for every night of the stay (None: index unavailable, don't filter).
+        index = get_occupancy_index()
+        free = index.free_counts(check_in, check_out) if index is not None else None
+        
+        # One vectorized quote prices the stay for every room type (seasonal rates,
+        # extra guests and long-stay discounts included).
+        calendar = get_rate_calendar()
+        if calendar is None:
+            print("[AVAILABILITY] Rate calendar unavailable")
+            return []
+        by_id = {room["id"]: room for room in room_types}
+        max_adults = [by_id[t]["max_adults"] if t in by_id else 0 for t in calendar.type_ids.tolist()]
+        prices = calendar.quote(check_in, check_out, guests, max_adults)
+        
         available = []
         
         for room in room_types:
@@ -243,31 +741,21 @@ def pms_check_availability_pricing(check_in, check_out, guests):
             if guests > room["max_occupancy"]:
                 continue
             
-           
-            
-        
-            base_price = room["base_price"]
-            total_price = base_price * nights
-            
-           
-            if guests > room["max_adults"]:
-                
-                extra_guests = guests - room["max_adults"]
-                total_price += (extra_guests * 20 * nights)  
+            if free is not None and free.get(room["id"], 0) == 0:
+                continue
             
-            if nights >= 7:
-                total_price *= 0.85  
-            elif nights >= 5:
-                total_price *= 0.90  
+            if room["id"] not in prices:
+                continue
             
             available.append({
                 "id": room["id"],
                 "name": room["name"],
                 "description": room["description"],
                 "max_occupancy": room["max_occupancy"],
-                "base_price": base_price,
+                "base_price": calendar.base_rate(room["id"], check_in),
                 "nights": nights,
-                "total_price": round(total_price, 2)
+                "total_price": prices[room["id"]],
+                "available_units": free.get(room["id"], 0) if free is not None else room["available_units"]
             })
         
         print(f"[AVAILABILITY] Found {len(available)} available room types")
@@ -278,6 +766,82 @@ def pms_check_availability_pricing(check_in, check_out, guests):
         return []
 
 
+def pms_flexible_search(window_start, window_end, nights, guests, sort="cheapest", limit=5):
+    """
+    Best stays of `nights` nights for `guests` guests that fit inside
+    [window_start, window_end], over every start date and room type at once.
+
+    sort="cheapest" ranks by total price (earlier dates first on ties);
+    sort="earliest" ranks by check-in date, then price.
+    Returns a list of options with check-in/out dates, room type and pricing.
+    """
+    try:
+        first = max(to_date(window_start), date.today())
+        last = to_date(window_end) - timedelta(days=nights)
+        index = get_occupancy_index()
+        if index is not None:
+            # Stays ending past the occupancy horizon can't be checked: drop those
+            # start dates instead of the whole search.
+            last = min(last, index.origin + timedelta(days=MAX_HORIZON_DAYS - nights))
+        if nights <= 0 or last < first:
+            print("[FLEXIBLE SEARCH] No start date in the window (shorter than the stay, or past the horizon)")
+            return []
+        starts = (last - first).days + 1
+
+        room_types = [rt for rt in get_room_types() if guests <= rt["max_occupancy"]]
+        calendar = get_rate_calendar()
+        if not room_types or calendar is None:
+            print("[FLEXIBLE SEARCH] No room types or rates available")
+            return []
+
+        # Price of every (start date, room type) from the rate calendar's prefix sums.
+        check_ins = calendar.offset(first) + np.arange(starts)
+        prices = calendar.quote_types(
+            [rt["id"] for rt in room_types], check_ins, check_ins + nights,
+            guests, [rt["max_adults"] for rt in room_types],
+        )
+
+        # Free rooms per (room type, start date) from sliding windows over the occupancy index.
+        units = np.full((starts, len(room_types)), -1, dtype=np.int64)
+        if index is not None:
+            types, counts = index.free_counts_by_start(first, last, nights)
+            row_of = {int(t): i for i, t in enumerate(types)}
+            units[:] = 0
+            if counts.shape[1] == starts:
+                for k, rt in enumerate(room_types):
+                    if rt["id"] in row_of:
+                        units[:, k] = counts[row_of[rt["id"]]]
+
+        candidates = ~np.isnan(prices) & (units != 0)
+        day, col = np.nonzero(candidates)
+        price = prices[day, col]
+        if sort == "earliest":
+            order = np.lexsort((price, day))
+        else:
+            order = np.lexsort((day, price))
+
+        options = []
+        for i in order[:limit]:
+            rt = room_types[col[i]]
+            check_in = first + timedelta(days=int(day[i]))
+            options.append({
+                "id": rt["id"],
+                "name": rt["name"],
+                "check_in": check_in.isoformat(),
+                "check_out": (check_in + timedelta(days=nights)).isoformat(),
+                "nights": nights,
+                "total_price": round(float(price[i]), 2),
+                "available_units": int(units[day[i], col[i]]) if units[day[i], col[i]] >= 0 else rt["available_units"],
+            })
+
+        print(f"[FLEXIBLE SEARCH] {starts} start dates x {len(room_types)} room types, {int(candidates.sum())} bookable")
+        return options
+
+    except Exception as e:
+        print(f"[ERROR] Flexible search failed: {e}")
+        return []
+
+
 def create_housekeeping_ticket(guest_name, room, text, priority="normal"):
     """Create a housekeeping ticket (mock implementation)"""
     ticket = {
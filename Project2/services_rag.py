@@ -1,159 +1,1421 @@
+import hashlib
 import json
 import os
+import queue
+import sys
+import threading
+import time
 import numpy as np
+from contextlib import contextmanager
 from pathlib import Path
-from config import EMBEDDING_DIM, RAG_FOLDER
+from config import (
+    EMBEDDING_DIM,
+    EMBED_BATCH_SIZE,
+    EMBED_MODEL_NAME,
+    EMBED_CACHE_ENABLED,
+    EMBED_CACHE_DISK_MB,
+    EMBED_CACHE_MEMORY_MB,
+    RAG_FOLDER,
+    RAG_MMAP,
+    RAG_REFRESH_INTERVAL,
+    RAG_SNAPSHOT_RETAIN,
+    RAG_QUANTIZATION,
+    RAG_HYBRID_DEPTH,
+    ANN_ENABLED,
+    ANN_MIN_ROWS,
+    ANN_NLIST,
+    ANN_NPROBE,
+    ANN_RETRAIN_RATIO,
+    RAG_COMPACT_RATIO,
+    RAG_SYNC_UPDATED_COLUMN,
+    RAG_BUILD_WORKERS,
+    RAG_STREAM_CHUNK,
+    RAG_SHARD_IDLE_SECONDS,
+    HOTEL_INFO_CHUNK_TOKENS,
+    HOTEL_INFO_CHUNK_OVERLAP,
+    HOTEL_INFO_CONTEXT_TOKENS,
+)
+from concurrent.futures import ThreadPoolExecutor
+from ann_index import IVFIndex, top_k_indices, top_k_rows
+from embed_cache import EmbeddingCache, cache_key
+from packed_meta import PackedMetadata
+from quantize import QuantizedMatrix
+from bm25_index import BM25Index, tokenize, reciprocal_rank_fusion
+import hash_embed
+from chunker import (
+    chunk_document, chunk_position, count_tokens,
+    merge_chunks, neighbour_ids, parent_id,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: syncs are only serialized within one process
+    fcntl = None
 
 try:
     from sentence_transformers import SentenceTransformer
-    MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+    MODEL = SentenceTransformer(EMBED_MODEL_NAME)
 except Exception:
     MODEL = None
 
+# Cache keys include the embedder, so switching model (or falling back) never mixes vectors.
+EMBEDDER_NAME = EMBED_MODEL_NAME if MODEL else hash_embed.NAME
+
+try:
+    if not EMBED_CACHE_ENABLED:
+        raise RuntimeError("embedding cache disabled")
+    os.makedirs(RAG_FOLDER, exist_ok=True)
+    EMBED_CACHE = EmbeddingCache(
+        Path(RAG_FOLDER) / "embed_cache.sqlite3",
+        disk_mb=EMBED_CACHE_DISK_MB,
+        memory_mb=EMBED_CACHE_MEMORY_MB,
+    )
+except Exception:
+    EMBED_CACHE = None
+
 
 
 
 def fallback_embed(text: str):
-    np.random.seed(abs(hash(text)) % (2**32))
-    return np.random.rand(EMBEDDING_DIM)
+    return hash_embed.embed_texts([text], EMBEDDING_DIM)[0]
 
 
 
 
-def embed(text: str):
+def _encode(texts, batch_size=EMBED_BATCH_SIZE):
     if MODEL:
-        return MODEL.encode(text)
-    return fallback_embed(text)
+        return MODEL.encode(texts, batch_size=batch_size)
+    # No model: deterministic feature hashing, identical in every process.
+    return hash_embed.embed_texts(texts, EMBEDDING_DIM)
+
+
+def embed(text: str):
+    return embed_many([text])[0]
+
+
+def embed_many(texts, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embed a list of texts, letting the model batch them. Returns an (n, dim) array.
+    Texts already in EMBED_CACHE are not re-encoded; new vectors are written back.
+    """
+    texts = list(texts)
+    # Hashing is cheaper than a cache lookup, so only model vectors are cached.
+    if EMBED_CACHE is None or not MODEL:
+        return _encode(texts, batch_size)
+
+    keys = [cache_key(EMBEDDER_NAME, t) for t in texts]
+    cached = EMBED_CACHE.get_many(keys)
+
+    todo = {}
+    for key, text in zip(keys, texts):
+        if key not in cached:
+            todo.setdefault(key, text)
+
+    if todo:
+        fresh = _encode(list(todo.values()), batch_size)
+        computed = dict(zip(todo.keys(), fresh))
+        EMBED_CACHE.put_many(computed.items())
+        cached.update(computed)
+
+    out = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for i, key in enumerate(keys):
+        out[i] = cached[key]
+    return out
+
+
+def embed_cache_stats():
+    return EMBED_CACHE.stats() if EMBED_CACHE is not None else {"enabled": False}
+
+
+def normalize_rows(vectors):
+    """Cast to float32 and scale each row to unit length so cosine is a plain dot product."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        return vectors / (np.linalg.norm(vectors) + 1e-8)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / (norms + 1e-8)
+
+
+def _replace_file(path: Path, write):
+    """Write through a temp file and rename it over `path`, so readers (and mmaps) never see a partial file."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def migrate_json_metadata(json_path: Path, packed_path: Path):
+    """
+    One-off conversion of a legacy metadata_<name>.json into the packed format.
+    Returns the loaded rows; the JSON file is left in place.
+    """
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+    except:
+        return []
+
+    try:
+        _replace_file(packed_path, lambda f: PackedMetadata.write(f, rows))
+        print(f"[RAG] Migrated {json_path.name} -> {packed_path.name} ({len(rows)} rows)")
+    except OSError as e:
+        print(f"[RAG] Could not write {packed_path.name}: {e}")
+    return rows
+
+
+def read_embeddings(path: Path):
+    """
+    Load an emb_*.npy file. With RAG_MMAP the file is mapped read-only, so every
+    worker process shares the OS page cache instead of holding a private copy.
+    Files that are not already unit-normalized float32 are copied and normalized.
+    """
+    if RAG_MMAP:
+        try:
+            data = np.load(path, mmap_mode="r")
+            sample = np.asarray(data[:1024])
+            if data.dtype == np.float32 and data.ndim == 2 and np.allclose(
+                np.linalg.norm(sample, axis=1), 1.0, atol=1e-3
+            ):
+                return data
+        except ValueError:
+            pass
+    return normalize_rows(np.load(path))
+
 
 
 
 
+class StaleSnapshotError(RuntimeError):
+    """save() on a working copy older than the snapshot another process has since published."""
+
+
+class StoreSnapshot:
+    """
+    Immutable view of a VectorStore that search() reads from.
+
+    Writers never modify the rows a snapshot can see: appends land past its
+    size, and compaction/clear allocate new arrays. Publishing a new snapshot
+    is a single reference assignment, so readers never block or see a torn state.
+    """
+
+    def __init__(self, version, embeddings, metadata, index, tombstones, quantized=None, lexical=None):
+        self.version = version
+        self.embeddings = embeddings
+        self.metadata = metadata
+        self.index = index
+        self.quantized = quantized
+        self.lexical = lexical
+        self.dead = np.fromiter(sorted(tombstones), dtype=np.int64, count=len(tombstones))
+        self._id_rows = None
+
+    def __len__(self):
+        return self.embeddings.shape[0] - len(self.dead)
+
+    def text(self, doc_id):
+        """Text of `doc_id` as this snapshot sees it, or None if it has no live row here."""
+        if self._id_rows is None:
+            # Built on first use; two readers racing here build the same map.
+            n = self.embeddings.shape[0]
+            if isinstance(self.metadata, PackedMetadata):
+                ids = self.metadata.ids()[:n]
+            else:
+                ids = [self.metadata[row]["id"] for row in range(n)]
+            dead = set(self.dead.tolist())
+            self._id_rows = {doc_id: row for row, doc_id in enumerate(ids) if row not in dead}
+        row = self._id_rows.get(doc_id)
+        return None if row is None else self.metadata[row]["text"]
+
+
 class VectorStore:
-    def __init__(self, name: str):
+    """
+    Embedding store for one RAG corpus.
+
+    The public attributes (embeddings, metadata, index, tombstones) are the
+    writer's working copy. search() only reads `self.snapshot`, which save()
+    (or publish()) replaces once a rebuild is complete. On disk, every save
+    writes a new version of the files, and current_<name>.json points at the
+    live one; the last RAG_SNAPSHOT_RETAIN versions are kept for rollback().
+
+    With lexical=True the store also keeps a BM25 index over its texts, saved
+    (and mapped back) with each version, and searches in "hybrid" mode by default.
+    """
+
+    def __init__(self, name: str, lexical=False):
         self.name = name
-        self.meta_path = Path(RAG_FOLDER) / f"metadata_{name}.json"
-        self.emb_path = Path(RAG_FOLDER) / f"emb_{name}.npy"
+        self.lexical = lexical
+        self.default_mode = "hybrid" if lexical else "dense"
+        self.folder = Path(RAG_FOLDER)
+        self.pointer_path = self.folder / f"current_{name}.json"
+
+        # Pre-versioning file names, still read when no pointer exists.
+        self.legacy_meta_path = self.folder / f"meta_{name}.bin"
+        self.legacy_json_meta_path = self.folder / f"metadata_{name}.json"
+        self.legacy_emb_path = self.folder / f"emb_{name}.npy"
+        self.legacy_index_path = self.folder / f"ivf_{name}.npz"
+        self.legacy_state_path = self.folder / f"state_{name}.json"
 
         self.metadata = []
-        self.embeddings = np.zeros((0, EMBEDDING_DIM))
+        self.embeddings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.index = None
+        self.lexical_index = None
+
+        # Incremental sync bookkeeping: high-water marks plus tombstoned row numbers.
+        self.sync_state = {}
+        self.tombstones = set()
+        self._id_rows = None
+
+        # Serializes writers (rebuilds, syncs, reloads). Readers never take it.
+        self.write_lock = threading.RLock()
+        self.version = 0
+        self.snapshot = None
+        # The saved rows when they are quantized (RAG_QUANTIZATION): then also
+        # self.embeddings, until a write copies them into a float32 buffer.
+        self.quantized = None
+
+        self._loaded_stamp = None
+        self._checked_at = time.monotonic()
 
         self._load()
 
+    def _paths(self, version):
+        return {
+            "meta": self.folder / f"meta_{self.name}.v{version}.bin",
+            "emb": self.folder / f"emb_{self.name}.v{version}.npy",
+            "index": self.folder / f"ivf_{self.name}.v{version}.npz",
+            "lexical": self.folder / f"lex_{self.name}.v{version}.bin",
+            "codes": self.folder / f"q_{self.name}.v{version}.npy",
+            "scales": self.folder / f"qscale_{self.name}.v{version}.npy",
+            "state": self.folder / f"state_{self.name}.v{version}.json",
+        }
 
-    def _load(self):
-        if self.meta_path.exists():
+    def versions(self):
+        """Complete on-disk versions, oldest first (the state file is written last)."""
+        prefix = f"state_{self.name}.v"
+        found = []
+        for path in self.folder.glob(f"{prefix}*.json"):
             try:
-                with open(self.meta_path, "r", encoding="utf-8") as f:
-                    self.metadata = json.load(f)
+                found.append(int(path.name[len(prefix):-len(".json")]))
+            except ValueError:
+                continue
+        return sorted(found)
+
+    def _read_pointer(self):
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["version"])
+        except Exception:
+            return None
+
+    def _load(self, version=None):
+        if version is None:
+            version = self._read_pointer()
+
+        if version is None:
+            self._load_files(
+                self.legacy_meta_path, self.legacy_emb_path, self.legacy_index_path, self.legacy_state_path
+            )
+            version = 0
+        else:
+            paths = self._paths(version)
+            self._load_files(
+                paths["meta"], paths["emb"], paths["index"], paths["state"], paths["codes"], paths["scales"]
+            )
+            self._load_lexical(paths["lexical"])
+
+        self.version = version
+        self._loaded_stamp = self._disk_stamp()
+        if self.lexical and (self.lexical_index is None or len(self.lexical_index) != self._size):
+            # Snapshots saved before BM25 was persisted: index the texts once, here.
+            self.build_lexical_index()
+        self.publish()
+
+    def _load_quantized(self, codes_path, scales_path):
+        """
+        Use the saved codes as the rows. A snapshot saved with quantization has
+        no float32 file, so its codes are loaded even if RAG_QUANTIZATION has
+        since been turned off; the next save() writes float32 again.
+        """
+        if not codes_path.exists() or (self._size and not RAG_QUANTIZATION):
+            return
+        try:
+            quantized = QuantizedMatrix.load(codes_path, scales_path, use_mmap=RAG_MMAP)
+        except Exception:
+            return
+        if self._size and len(quantized) != self._size:
+            return
+        self.embeddings = quantized
+        self.quantized = quantized
+
+    def _load_lexical(self, path):
+        if not self.lexical or not path.exists():
+            return
+        try:
+            self.lexical_index = BM25Index.load(path, use_mmap=RAG_MMAP)
+        except Exception:
+            self.lexical_index = None
+
+    def _load_files(self, meta_path, emb_path, index_path, state_path, codes_path=None, scales_path=None):
+        if meta_path.exists():
+            try:
+                self.metadata = PackedMetadata.load(meta_path, use_mmap=RAG_MMAP)
             except:
                 self.metadata = []
+        elif self.legacy_json_meta_path.exists() and meta_path == self.legacy_meta_path:
+            self.metadata = migrate_json_metadata(self.legacy_json_meta_path, meta_path)
+
+        if emb_path.exists():
+            try:
+                self.embeddings = read_embeddings(emb_path)
+            except:
+                self.embeddings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        if codes_path is not None:
+            self._load_quantized(codes_path, scales_path)
+
+        if index_path.exists():
+            try:
+                index = IVFIndex.load(index_path)
+                if index.size <= self.embeddings.shape[0]:
+                    self.index = index
+            except:
+                self.index = None
 
-        if self.emb_path.exists():
+        if state_path.exists():
             try:
-                self.embeddings = np.load(self.emb_path)
+                with open(state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                self.tombstones = {r for r in state.pop("tombstones", []) if r < self._size}
+                self.sync_state = state
             except:
-                self.embeddings = np.zeros((0, EMBEDDING_DIM))
+                self.sync_state = {}
+                self.tombstones = set()
+
+    def _disk_stamp(self):
+        # The pointer is written last by save(), so its mtime marks a complete snapshot.
+        try:
+            return self.pointer_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def publish(self):
+        """Make the working copy visible to search() with one reference swap."""
+        self.snapshot = StoreSnapshot(
+            self.version,
+            self.embeddings,
+            self.metadata,
+            self.index,
+            self.tombstones,
+            # Once rows are written the working copy is float32 again, until the next save.
+            quantized=self.quantized if self.embeddings is self.quantized else None,
+            lexical=self.lexical_index,
+        )
+        return self.snapshot
+
+    def reload(self, version=None):
+        """Drop the working copy and load (or remap) a snapshot from disk, then publish it."""
+        with self.write_lock:
+            self.clear()
+            self.sync_state = {}
+            self._load(version)
+
+    def catch_up(self):
+        """Reload if another process has saved since this copy was loaded. Call before writing."""
+        with self.write_lock:
+            current = self._read_pointer()
+            if current is None or current == self.version:
+                return False
+            self.reload()
+            return True
+
+    def rollback(self, version=None):
+        """Point the store back at an older retained version (default: the one before current)."""
+        with self.write_lock:
+            if version is None:
+                older = [v for v in self.versions() if v < self.version]
+                if not older:
+                    return None
+                version = older[-1]
+            elif version not in self.versions():
+                raise ValueError(f"{self.name}: snapshot v{version} is not retained")
+
+            _replace_file(self.pointer_path, lambda f: f.write(json.dumps({"version": version}).encode("utf-8")))
+            self.reload(version)
+            return version
+
+    def refresh(self):
+        """
+        Remap the on-disk snapshot if another process saved a newer one.
+        Checks at most once per RAG_REFRESH_INTERVAL seconds, and never while
+        this process is itself writing the store.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < RAG_REFRESH_INTERVAL:
+            return False
+        self._checked_at = now
+
+        stamp = self._disk_stamp()
+        if stamp is None or stamp == self._loaded_stamp:
+            return False
+
+        if not self.write_lock.acquire(blocking=False):
+            return False
+        try:
+            self.reload()
+        finally:
+            self.write_lock.release()
+        return True
+
+
+    @property
+    def embeddings(self):
+        """Live rows of the backing buffer; spare capacity past self._size is never exposed."""
+        if isinstance(self._buffer, QuantizedMatrix):
+            return self._buffer
+        return self._buffer[:self._size]
+
+    @embeddings.setter
+    def embeddings(self, value):
+        if isinstance(value, QuantizedMatrix):
+            self._buffer = value
+        else:
+            self._buffer = np.ascontiguousarray(value, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        self._size = self._buffer.shape[0]
+
+    def _reserve(self, rows):
+        """Grow the backing buffer (doubling) so it can hold `rows` rows."""
+        capacity = self._buffer.shape[0]
+        if rows <= capacity and isinstance(self._buffer, np.ndarray) and self._buffer.flags.writeable:
+            return
+
+        # A read-only (memory-mapped) or quantized buffer is copied into private
+        # float32 memory on first write.
+        new_capacity = max(rows, capacity * 2, 16) if rows > capacity else capacity
+        grown = np.empty((new_capacity, EMBEDDING_DIM), dtype=np.float32)
+        grown[:self._size] = self._buffer[:self._size]
+        self._buffer = grown
 
     
     def save(self):
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            json.dump(self.metadata, f, indent=2)
+        """
+        Write the working copy as a new versioned snapshot, atomically repoint
+        current_<name>.json at it, publish it to readers and prune old versions.
+        """
+        with self.write_lock:
+            current = self._read_pointer()
+            if current is not None and current != self.version:
+                # Writing anyway would publish this copy over rows it never saw.
+                raise StaleSnapshotError(
+                    f"{self.name}: loaded v{self.version} but v{current} is live; reload and retry"
+                )
+            version = max(self.versions() + [self.version]) + 1
+            paths = self._paths(version)
 
-        np.save(self.emb_path, self.embeddings)
+            _replace_file(paths["meta"], lambda f: PackedMetadata.write(f, self.metadata))
+            # With quantization only the codes are kept: no float32 file next to them.
+            rows = self.embeddings
+            self.quantized = None
+            if RAG_QUANTIZATION and self._size:
+                if not (isinstance(rows, QuantizedMatrix) and rows.mode == RAG_QUANTIZATION):
+                    rows = QuantizedMatrix.build(rows, RAG_QUANTIZATION)
+                _replace_file(paths["codes"], lambda f: np.save(f, rows.codes))
+                _replace_file(paths["scales"], lambda f: np.save(f, rows.scales))
+                self.quantized = self.embeddings = rows
+            else:
+                _replace_file(paths["emb"], lambda f: np.save(f, rows[:]))
+            if self.index is not None:
+                _replace_file(paths["index"], self.index.save)
+            if self.lexical_index is not None:
+                self.lexical_index = self.lexical_index.frozen()
+                _replace_file(paths["lexical"], self.lexical_index.write)
+
+            state = {**self.sync_state, "tombstones": sorted(self.tombstones)}
+            _replace_file(paths["state"], lambda f: f.write(json.dumps(state).encode("utf-8")))
+            _replace_file(self.pointer_path, lambda f: f.write(json.dumps({"version": version}).encode("utf-8")))
+
+            if RAG_MMAP:
+                # Swap the private build buffers for mappings of the files just written.
+                if self.quantized is not None:
+                    self.quantized = self.embeddings = QuantizedMatrix.load(paths["codes"], paths["scales"])
+                else:
+                    self.embeddings = read_embeddings(paths["emb"])
+                self.metadata = PackedMetadata.load(paths["meta"])
+                if self.lexical_index is not None:
+                    self.lexical_index = BM25Index.load(paths["lexical"])
+
+            self.version = version
+            self._loaded_stamp = self._disk_stamp()
+            self.publish()
+            self._prune()
+
+    def _prune(self):
+        """Delete versions beyond the newest RAG_SNAPSHOT_RETAIN (never the live one)."""
+        keep = set(self.versions()[-RAG_SNAPSHOT_RETAIN:]) | {self.version}
+        for version in self.versions():
+            if version in keep:
+                continue
+            # Processes that still map these files keep them alive until they remap.
+            for path in self._paths(version).values():
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+    def build_index(self, nlist=ANN_NLIST):
+        """(Re)train the IVF index. Small stores drop the index and stay exact."""
+        if not ANN_ENABLED or self.embeddings.shape[0] < ANN_MIN_ROWS:
+            self.index = None
+            return None
+
+        self.index = IVFIndex.build(self.embeddings, nlist=nlist or None)
+        return self.index
+
+    def build_lexical_index(self):
+        """Rebuild the BM25 index from the working metadata (lexical stores only)."""
+        if not self.lexical:
+            self.lexical_index = None
+            return None
+
+        meta = self.metadata
+        if isinstance(meta, PackedMetadata):
+            texts = (meta.text(i) for i in range(len(meta)))
+        else:
+            texts = (m["text"] for m in meta)
+        self.lexical_index = BM25Index.build(texts)
+        return self.lexical_index
 
 
     def add(self, doc_id: str, text: str):
-        vector = embed(text)
+        vector = normalize_rows(embed(text))
 
         self.metadata.append({
             "id": doc_id,
             "text": text
         })
 
-        if self.embeddings.shape[0] == 0:
-            self.embeddings = np.array([vector])
+        self._reserve(self._size + 1)
+        self._buffer[self._size] = vector
+        if self._id_rows is not None:
+            self._id_rows[doc_id] = self._size
+        if self.lexical_index is not None:
+            self.lexical_index.add(self._size, [text])
+        self._size += 1
+
+    def add_many(self, ids, texts, batch_size=EMBED_BATCH_SIZE):
+        """
+        Bulk ingest: embed `texts` in batches of `batch_size` and write them
+        straight into the backing buffer, growing it at most once.
+        """
+        ids = list(ids)
+        texts = list(texts)
+        if len(ids) != len(texts):
+            raise ValueError("ids and texts must have the same length")
+        if not texts:
+            return 0
+
+        start = self._size
+        self._reserve(start + len(texts))
+
+        for offset in range(0, len(texts), batch_size):
+            batch = texts[offset:offset + batch_size]
+            self._buffer[start + offset:start + offset + len(batch)] = normalize_rows(embed_many(batch, batch_size))
+
+        self._size = start + len(texts)
+        self.metadata.extend({"id": doc_id, "text": text} for doc_id, text in zip(ids, texts))
+        if self._id_rows is not None:
+            self._id_rows.update((doc_id, start + i) for i, doc_id in enumerate(ids))
+        if self.lexical_index is not None:
+            self.lexical_index.add(start, texts)
+        return len(texts)
+
+    def clear(self):
+        self.metadata = []
+        self.embeddings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.index = None
+        self.quantized = None
+        self.lexical_index = BM25Index() if self.lexical else None
+        self.tombstones = set()
+        self._id_rows = None
+
+    def __len__(self):
+        """Live rows in the published snapshot."""
+        return len(self.snapshot)
+
+    def _row_map(self):
+        """doc id -> row of its live version, built on first use."""
+        if self._id_rows is None:
+            if isinstance(self.metadata, PackedMetadata):
+                ids = self.metadata.ids()
+            else:
+                ids = [m["id"] for m in self.metadata]
+            self._id_rows = {
+                doc_id: row for row, doc_id in enumerate(ids) if row not in self.tombstones
+            }
+        return self._id_rows
+
+    def delete(self, ids):
+        """Tombstone the live rows for `ids`. Rows stay in the buffer until compact()."""
+        rows = self._row_map()
+        removed = 0
+        for doc_id in ids:
+            row = rows.pop(str(doc_id), None)
+            if row is not None:
+                self.tombstones.add(row)
+                removed += 1
+        return removed
+
+    def upsert_many(self, ids, texts, batch_size=EMBED_BATCH_SIZE):
+        """
+        Replace existing versions of `ids` (tombstoning them) and append the new
+        texts. Rows whose live text is already identical are left alone.
+        """
+        rows = self._row_map()
+        meta = self.metadata
+        fresh_ids = []
+        fresh_texts = []
+        for doc_id, text in zip((str(i) for i in ids), texts):
+            row = rows.get(doc_id)
+            if row is not None:
+                live = meta.text(row) if isinstance(meta, PackedMetadata) else meta[row]["text"]
+                if live == text:
+                    continue
+            fresh_ids.append(doc_id)
+            fresh_texts.append(text)
+        self.delete(fresh_ids)
+        return self.add_many(fresh_ids, fresh_texts, batch_size)
+
+    def compact(self):
+        """Drop tombstoned rows from the buffer and metadata, then retrain the index."""
+        if not self.tombstones:
+            return 0
+
+        keep = np.ones(self._size, dtype=bool)
+        keep[list(self.tombstones)] = False
+        removed = len(self.tombstones)
+
+        self.embeddings = self.embeddings[keep]
+        self.metadata = [m for m, k in zip(self.metadata, keep) if k]
+        self.quantized = None
+        if self.lexical_index is not None:
+            self.lexical_index = self.lexical_index.without_rows(self.tombstones)
+        self.tombstones = set()
+        self._id_rows = None
+        self.build_index()
+        return removed
+
+    def needs_compaction(self):
+        return len(self.tombstones) > RAG_COMPACT_RATIO * max(self._size, 1)
+
+    def needs_reindex(self):
+        """
+        True once the rows appended since the IVF index was trained pass
+        ANN_RETRAIN_RATIO of it, or the store has grown past ANN_MIN_ROWS without one.
+        """
+        if not ANN_ENABLED or self._size < ANN_MIN_ROWS:
+            return False
+        if self.index is None:
+            return True
+        return self._size - self.index.size > ANN_RETRAIN_RATIO * self.index.size
+
+    def reindex(self):
+        """Retrain the index if needs_reindex(); returns 1 if it was retrained."""
+        if not self.needs_reindex():
+            return 0
+        self.build_index()
+        return 1
+
+    def search(self, query: str, top_k=3, exact=False, nprobe=ANN_NPROBE, mode=None, snapshot=None):
+        """
+        Top_k documents for `query`.
+
+        mode "dense" is cosine search: the IVF index when one is built, else a
+        scan of every row (int8 codes when the snapshot was saved with
+        RAG_QUANTIZATION, float32 otherwise); exact=True skips the index. "lexical" is BM25
+        only, and "hybrid" fuses both rankings with reciprocal rank fusion.
+        In lexical and hybrid mode, a query containing an indexed identifier
+        (email, booking id, phone) is answered from BM25 alone, without
+        embedding it. Defaults to the store's default_mode.
+
+        Pass `snapshot` (a StoreSnapshot of this store) to search that one
+        instead of refreshing and taking the published snapshot.
+        """
+        return self.search_many([query], top_k, exact=exact, nprobe=nprobe, mode=mode, snapshot=snapshot)[0]
+
+    def search_many(self, queries, top_k=3, exact=False, nprobe=ANN_NPROBE, mode=None, snapshot=None):
+        """
+        Batched search: one embed_many call for all queries that need the dense
+        ranking and, on the exact path, one matrix-matrix product per block of
+        queries. Returns a list of per-query result lists in input order.
+        """
+        queries = list(queries)
+        if snapshot is None:
+            self.refresh()
+            snapshot = self.snapshot
+        # Everything below reads this one snapshot, whatever writers do meanwhile.
+        snap = snapshot
+        if len(snap) == 0 or not queries:
+            return [[] for _ in queries]
+
+        mode = mode or self.default_mode
+        if snap.lexical is None:
+            mode = "dense"
+        top_k = min(top_k, len(snap))
+
+        results = [None] * len(queries)
+        pending = []
+        for qi, query in enumerate(queries):
+            if mode == "dense":
+                pending.append(qi)
+                continue
+
+            tokens = tokenize(query)
+            # Only rows this snapshot can serve count: unpublished or tombstoned matches fall through.
+            identifiers = snap.lexical.identifier_tokens(tokens, snap.embeddings.shape[0], snap.dead)
+            if identifiers or mode == "lexical":
+                idxs, scores = self._search_lexical(snap, identifiers or tokens, top_k)
+                results[qi] = self._results(snap, idxs, scores)
+            else:
+                pending.append(qi)
+
+        if not pending:
+            return results
+
+        depth = top_k if mode == "dense" else min(top_k * RAG_HYBRID_DEPTH, len(snap))
+        qvs = normalize_rows(embed_many([queries[qi] for qi in pending])).reshape(-1, EMBEDDING_DIM)
+
+        if snap.index is not None and not exact:
+            hits = [self._search_index(snap, qv, depth, nprobe) for qv in qvs]
+        elif snap.quantized is not None:
+            # The codes are the only copy of the rows: exact=True can't do better.
+            hits = [self._search_quantized(snap, qv, depth) for qv in qvs]
         else:
-            self.embeddings = np.vstack([self.embeddings, vector])
+            hits = self._search_exact(snap, qvs, depth)
+
+        for qi, (idxs, scores) in zip(pending, hits):
+            if mode == "hybrid":
+                lexical_idxs, _ = self._search_lexical(snap, tokenize(queries[qi]), depth)
+                fused, fused_scores = reciprocal_rank_fusion([idxs, lexical_idxs])
+                idxs, scores = fused[:top_k], fused_scores[:top_k]
+            results[qi] = self._results(snap, idxs, scores)
+        return results
+
+    @staticmethod
+    def _search_lexical(snap, tokens, top_k):
+        rows, scores = snap.lexical.score(tokens, limit=snap.embeddings.shape[0])
+        if len(snap.dead) and len(rows):
+            alive = ~np.isin(rows, snap.dead)
+            rows, scores = rows[alive], scores[alive]
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+    @staticmethod
+    def _search_index(snap, qv, top_k, nprobe):
+        dead = snap.dead
+        idxs, scores = snap.index.search(snap.embeddings, qv, top_k + len(dead), nprobe)
+        if len(dead):
+            alive = ~np.isin(idxs, dead)
+            idxs, scores = idxs[alive][:top_k], scores[alive][:top_k]
+        return idxs, scores
+
+    @staticmethod
+    def _search_quantized(snap, qv, top_k):
+        scores = snap.quantized.scores(qv)
+        scores[snap.dead] = -np.inf
+        best = top_k_indices(scores, top_k)
+        return best, scores[best]
+
+    @staticmethod
+    def _search_exact(snap, qvs, top_k):
+        # Rows are stored unit-normalized, so a matrix product gives every cosine at once.
+        # Queries are blocked so the (queries x rows) score matrix stays around 64 MB.
+        n = snap.embeddings.shape[0]
+        step = max(1, 2**24 // max(n, 1))
+        hits = []
+        for start in range(0, len(qvs), step):
+            sims = qvs[start:start + step] @ snap.embeddings.T
+            sims[:, snap.dead] = -np.inf
+            idxs = top_k_rows(sims, top_k)
+            scores = np.take_along_axis(sims, idxs, axis=1)
+            hits.extend(zip(idxs, scores))
+        return hits
+
+    @staticmethod
+    def _results(snap, idxs, scores):
+        results = []
+        for i, s in zip(idxs, scores):
+            # Only the hits are decoded from packed metadata.
+            m = snap.metadata[int(i)]
+            results.append({"score": float(s), "id": m["id"], "text": m["text"]})
+        return results
+
+
+
+class ShardedStore:
+    """
+    One VectorStore per tenant, keyed by `partition_column` (company_id) and
+    named <name>_c<company_id>, so a tenant's searches never scan other
+    tenants' vectors.
 
-    def search(self, query: str, top_k=3):
-        if len(self.metadata) == 0:
+    Shards are loaded on first use and dropped from memory once idle for
+    RAG_SHARD_IDLE_SECONDS. shards_<name>.json lists the tenants with their
+    row counts and holds the table-level sync state.
+
+    Writers hold write_lock and add or delete whole DB rows, which are routed
+    to their shard by the partition column; save() saves the touched shards.
+    A row is assumed to stay with its tenant: an update is upserted into the
+    shard of its current company_id only.
+    """
+
+    def __init__(self, name: str, partition_column="company_id", lexical=False):
+        self.name = name
+        self.partition_column = partition_column
+        self.lexical = lexical
+        self.manifest_path = Path(RAG_FOLDER) / f"shards_{name}.json"
+
+        self.write_lock = threading.RLock()
+        self._shards_lock = threading.Lock()
+        self._shards = {}
+        self._last_used = {}
+        self._dirty = set()
+        self._swept_at = time.monotonic()
+
+        self.version = 0
+        self.counts = {}
+        self.sync_state = {}
+        self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except Exception:
+            return False
+        self.version = manifest.get("version", 0)
+        self.counts = {int(c): n for c, n in manifest.get("companies", {}).items()}
+        self.sync_state = manifest.get("sync_state", {})
+        return True
+
+    def _write_manifest(self):
+        manifest = {
+            "version": self.version,
+            "companies": {str(c): n for c, n in sorted(self.counts.items())},
+            "sync_state": self.sync_state,
+        }
+        _replace_file(self.manifest_path, lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+
+    def companies(self):
+        return sorted(set(self.counts) | self._dirty)
+
+    def shard(self, company_id, create=False):
+        """The shard for `company_id`, loaded on first use; None for an unknown tenant unless `create`."""
+        company_id = int(company_id)
+        store = self._shards.get(company_id)
+        if store is None:
+            if company_id not in self.counts and company_id not in self._dirty and not create:
+                # Another process may have added the tenant since the manifest was read.
+                if not self.write_lock.acquire(blocking=False):
+                    return None
+                try:
+                    self._read_manifest()
+                finally:
+                    self.write_lock.release()
+                if company_id not in self.counts:
+                    return None
+
+            with self._shards_lock:
+                store = self._shards.get(company_id)
+                if store is None:
+                    store = VectorStore(f"{self.name}_c{company_id}", lexical=self.lexical)
+                    self._shards[company_id] = store
+        self._last_used[company_id] = time.monotonic()
+        return store
+
+    def loaded(self):
+        return sorted(self._shards)
+
+    def evict_idle(self, max_idle=RAG_SHARD_IDLE_SECONDS):
+        """Drop shards not searched for `max_idle` seconds (never ones with unsaved writes)."""
+        if not self.write_lock.acquire(blocking=False):
             return []
+        try:
+            now = time.monotonic()
+            idle = [c for c, used in list(self._last_used.items())
+                    if now - used > max_idle and c not in self._dirty]
+            with self._shards_lock:
+                for company_id in idle:
+                    self._shards.pop(company_id, None)
+                    self._last_used.pop(company_id, None)
+        finally:
+            self.write_lock.release()
+        if idle:
+            print(f"[RAG] {self.name}: evicted idle shards {idle}")
+        return idle
 
-        qv = embed(query)
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._swept_at >= RAG_REFRESH_INTERVAL:
+            self._swept_at = now
+            self.evict_idle()
 
-        
-        sims = (self.embeddings @ qv) / (
-            np.linalg.norm(self.embeddings, axis=1) * np.linalg.norm(qv) + 1e-8
-        )
+    def _group(self, rows, id_column, to_text=None):
+        groups = {}
+        for r in rows:
+            ids, texts = groups.setdefault(int(r[self.partition_column] or 0), ([], []))
+            ids.append(str(r[id_column]))
+            if to_text is not None:
+                texts.append(to_text(r))
+        return groups
 
-        idxs = np.argsort(sims)[::-1][:top_k]
+    def add_rows(self, rows, id_column, to_text):
+        added = 0
+        for company_id, (ids, texts) in self._group(rows, id_column, to_text).items():
+            added += self.shard(company_id, create=True).add_many(ids, texts)
+            self._dirty.add(company_id)
+        return added
 
-        return [
-            {"score": float(sims[i]), "id": self.metadata[i]["id"], "text": self.metadata[i]["text"]}
-            for i in idxs
-        ]
+    def upsert_rows(self, rows, id_column, to_text):
+        upserted = 0
+        for company_id, (ids, texts) in self._group(rows, id_column, to_text).items():
+            upserted += self.shard(company_id, create=True).upsert_many(ids, texts)
+            self._dirty.add(company_id)
+        return upserted
+
+    def delete_rows(self, rows, id_column):
+        removed = 0
+        for company_id, (ids, _) in self._group(rows, id_column).items():
+            shard = self.shard(company_id)
+            if shard is None:
+                continue
+            # Ids already tombstoned (or never indexed) remove nothing and leave the shard clean.
+            deleted = shard.delete(ids)
+            if deleted:
+                removed += deleted
+                self._dirty.add(company_id)
+        return removed
+
+    def clear(self):
+        for company_id in self.companies():
+            self.shard(company_id, create=True).clear()
+            self._dirty.add(company_id)
+        self.sync_state = {}
+
+    def build_index(self):
+        for company_id in sorted(self._dirty):
+            self.shard(company_id, create=True).build_index()
+
+    def needs_compaction(self):
+        return any(self.shard(c, create=True).needs_compaction() for c in self._dirty)
+
+    def compact(self):
+        compacted = 0
+        for company_id in sorted(self._dirty):
+            shard = self.shard(company_id, create=True)
+            if shard.needs_compaction():
+                compacted += shard.compact()
+        return compacted
+
+    def reindex(self):
+        """Retrain the index of every touched shard that needs it; returns how many were."""
+        return sum(self.shard(c, create=True).reindex() for c in sorted(self._dirty))
+
+    def _disk_version(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("version", 0)
+        except Exception:
+            return None
+
+    def save(self):
+        """Save every touched shard, then the manifest."""
+        with self.write_lock:
+            current = self._disk_version()
+            if current is not None and current != self.version:
+                raise StaleSnapshotError(
+                    f"{self.name}: loaded manifest v{self.version} but v{current} is live; reload and retry"
+                )
+            for company_id in sorted(self._dirty):
+                shard = self.shard(company_id, create=True)
+                shard.save()
+                self.counts[company_id] = len(shard)
+            self._dirty.clear()
+            self.version += 1
+            self._write_manifest()
+
+    def reload(self):
+        """Drop unsaved writes: reload touched shards and the manifest from disk."""
+        with self.write_lock:
+            for company_id in sorted(self._dirty):
+                self.shard(company_id, create=True).reload()
+            self._dirty.clear()
+            self.counts = {}
+            self.sync_state = {}
+            self._read_manifest()
+
+    def catch_up(self):
+        """Reload the manifest and any loaded shard another process has saved since."""
+        with self.write_lock:
+            stale = bool(self._dirty) or self._disk_version() not in (None, self.version)
+            for company_id in self.loaded():
+                self.shard(company_id).catch_up()
+            if stale:
+                self.reload()
+            return stale
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def _route(self, filters):
+        filters = dict(filters or {})
+        unsupported = set(filters) - {self.partition_column}
+        if unsupported:
+            raise ValueError(f"{self.name}: cannot filter on {sorted(unsupported)}, only {self.partition_column}")
+
+        if self.partition_column not in filters:
+            wanted = self.companies()
+        else:
+            value = filters[self.partition_column]
+            wanted = value if isinstance(value, (list, tuple, set)) else [value]
+        return [s for s in (self.shard(c) for c in wanted) if s is not None]
+
+    def search(self, query: str, top_k=3, filters=None, **kwargs):
+        """
+        Search the shards selected by `filters` ({"company_id": 1} or a list of
+        ids); without a filter, every tenant is searched and the hits merged.
+        Other keyword arguments are passed to VectorStore.search.
+        """
+        return self.search_many([query], top_k, filters, **kwargs)[0]
 
+    def search_many(self, queries, top_k=3, filters=None, **kwargs):
+        queries = list(queries)
+        self._maybe_sweep()
+        shards = self._route(filters)
+        if len(shards) == 1:
+            return shards[0].search_many(queries, top_k, **kwargs)
 
+        per_shard = [shard.search_many(queries, top_k, **kwargs) for shard in shards]
+        if (kwargs.get("mode") or shards[0].default_mode) == "dense":
+            # Cosine scores mean the same thing in every shard.
+            return [
+                sorted((h for found in per_shard for h in found[qi]), key=lambda h: h["score"], reverse=True)[:top_k]
+                for qi in range(len(queries))
+            ]
+        return [self._fuse([found[qi] for found in per_shard], top_k) for qi in range(len(queries))]
 
-CUSTOMER_STORE = VectorStore("customers")
-BOOKING_STORE = VectorStore("bookings")
+    @staticmethod
+    def _fuse(lists, top_k):
+        """
+        Merge per-shard hit lists with reciprocal rank fusion on their ranks.
+        Their scores can't be compared: BM25 depends on each shard's own term
+        statistics, and hybrid scores are already RRF (about 0.03, vs 1+ for
+        BM25 when a shard answered an identifier lexically). Hits of equal
+        rank are ordered by their shard score.
+        """
+        flat = [hit for found in lists for hit in found]
+        rankings = []
+        start = 0
+        for found in lists:
+            rankings.append(range(start, start + len(found)))
+            start += len(found)
+        rows, scores = reciprocal_rank_fusion(rankings)
+        ordered = sorted(zip(rows, scores), key=lambda rs: (rs[1], flat[rs[0]]["score"]), reverse=True)
+        return [{**flat[row], "score": score} for row, score in ordered[:top_k]]
+
+
+
+CUSTOMER_STORE = ShardedStore("customers", lexical=True)
+BOOKING_STORE = ShardedStore("bookings")
 ROOM_TYPE_STORE = VectorStore("room_types")
-HOTEL_INFO_STORE = VectorStore("hotel_info")
+HOTEL_INFO_STORE = VectorStore("hotel_info", lexical=True)
+
+
+
+
+def customer_text(c):
+    return f"{c.get('customer_name', '')} | {c.get('email', '')}"
+
+
+def booking_text(b):
+    return f"Booking ID {b.get('booking_id')} for Customer {b.get('booking_customer_id')}"
+
+
+def _rss_mb():
+    """Resident memory of this process in MB (peak so far where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    except Exception:
+        return None
+
+
+class BuildProgress:
+    """
+    Rows ingested, throughput and peak resident memory of one store rebuild
+    or sync. Builders set `expected` once they know the row count, which
+    enables the ETA.
+    """
+
+    LOG_INTERVAL = 5  # seconds between progress lines
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.expected = None
+        self.started = time.monotonic()
+        self.finished = None
+        self.peak_rss_mb = _rss_mb()
+        self._logged_at = self.started
+
+    def advance(self, rows):
+        self.rows += rows
+        rss = _rss_mb()
+        if rss is not None and (self.peak_rss_mb is None or rss > self.peak_rss_mb):
+            self.peak_rss_mb = rss
+
+        now = time.monotonic()
+        if now - self._logged_at >= self.LOG_INTERVAL:
+            self._logged_at = now
+            print(f"[RAG BUILD] {self.name}: {self.rows} rows ({self.rows_per_sec:.0f} rows/s)")
+
+    def finish(self):
+        self.advance(0)
+        self.finished = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta_s(self):
+        """Seconds left at the current rate; None while the total or the rate is unknown."""
+        if self.finished is not None:
+            return 0.0
+        if self.expected is None or self.rows_per_sec <= 0:
+            return None
+        return max(self.expected - self.rows, 0) / self.rows_per_sec
+
+    def report(self):
+        eta = self.eta_s
+        return {
+            "rows": self.rows,
+            "expected": self.expected,
+            "eta_s": round(eta, 1) if eta is not None else None,
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            # Process-wide: stores built in parallel share it.
+            "peak_rss_mb": round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+        }
+
+
+def _prefetch(chunks, depth=2):
+    """
+    Iterate `chunks` on a background thread, staying up to `depth` items ahead,
+    so producing the next chunk (a DB fetch) overlaps consuming this one.
+    """
+    pending = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                while not stop.is_set():
+                    try:
+                        pending.put(chunk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+            item = done
+        except Exception as e:
+            item = e
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = pending.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
 
+def _stream_into(store, query, id_column, to_text, progress=None):
+    """
+    Stream `query` in RAG_STREAM_CHUNK-row chunks into `store`, embedding each
+    chunk while the next one is fetched. Returns the highest id seen.
+    """
+    from services_pms import stream_query
 
+    high_water = 0
+    for rows in _prefetch(stream_query(query, chunk_size=RAG_STREAM_CHUNK)):
+        store.add_rows(rows, id_column, to_text)
+        high_water = max(high_water, max(int(r[id_column]) for r in rows))
+        if progress is not None:
+            progress.advance(len(rows))
+    return high_water
 
 
-def build_customer_rag():
+def _count_live(table):
     from services_pms import execute_query
 
-    query = "SELECT customer_id, customer_name, email FROM customer WHERE is_deleted = 0"
-    customers = execute_query(query) or []
+    res = execute_query(f"SELECT COUNT(*) AS n FROM {table} WHERE is_deleted = 0")
+    return int(res[0]["n"]) if res else None
 
-    CUSTOMER_STORE.metadata = []
-    CUSTOMER_STORE.embeddings = np.zeros((0, EMBEDDING_DIM))
 
-    for c in customers:
-        text = f"{c.get('customer_name', '')} | {c.get('email', '')}"
-        CUSTOMER_STORE.add(str(c.get('customer_id', '0')), text)
+def _count_deleted(table):
+    from services_pms import execute_query
 
-    CUSTOMER_STORE.save()
-    return len(CUSTOMER_STORE.metadata)
+    res = execute_query(f"SELECT COUNT(*) AS n FROM {table} WHERE is_deleted = 1")
+    return int(res[0]["n"]) if res else None
 
 
-def build_booking_rag():
+def _updated_mark(table):
+    """
+    MAX(update column) of `table`, or None without one. Read before a rebuild
+    streams the table, so rows edited while it runs are picked up by the next sync.
+    """
     from services_pms import execute_query
 
-    query = "SELECT booking_id, booking_customer_id FROM booking WHERE is_deleted = 0"
-    bookings = execute_query(query) or []
+    updated_column = RAG_SYNC_UPDATED_COLUMN.get(table)
+    if not updated_column:
+        return None
+    res = execute_query(f"SELECT MAX({updated_column}) AS updated_at FROM {table}")
+    if res and res[0]["updated_at"] is not None:
+        return str(res[0]["updated_at"])
+    return None
+
+
+def _mark_synced(name, high_water, updated_at, deleted_count):
+    """Record the high-water marks after a full rebuild of a SYNC_SOURCES store."""
+    SYNC_SOURCES[name]["store"].sync_state = {
+        "high_water": high_water,
+        "updated_at": updated_at,
+        "deleted_count": deleted_count,
+        "embedder": EMBEDDER_NAME,
+    }
+
+
+def build_customer_rag(progress=None):
+    query = "SELECT customer_id, customer_name, email, company_id FROM customer WHERE is_deleted = 0"
+
+    with CUSTOMER_STORE.write_lock:
+        CUSTOMER_STORE.clear()
+
+        if progress is not None:
+            progress.expected = _count_live("customer")
+        updated_at = _updated_mark("customer")
+        deleted_count = _count_deleted("customer")
+        high_water = _stream_into(CUSTOMER_STORE, query, "customer_id", customer_text, progress)
+
+        _mark_synced("customers", high_water, updated_at, deleted_count)
+        CUSTOMER_STORE.build_index()
+        CUSTOMER_STORE.save()
+    return len(CUSTOMER_STORE)
+
+
+def build_booking_rag(progress=None):
+    query = "SELECT booking_id, booking_customer_id, company_id FROM booking WHERE is_deleted = 0"
+
+    with BOOKING_STORE.write_lock:
+        BOOKING_STORE.clear()
+
+        if progress is not None:
+            progress.expected = _count_live("booking")
+        updated_at = _updated_mark("booking")
+        deleted_count = _count_deleted("booking")
+        high_water = _stream_into(BOOKING_STORE, query, "booking_id", booking_text, progress)
+
+        _mark_synced("bookings", high_water, updated_at, deleted_count)
+        BOOKING_STORE.build_index()
+        BOOKING_STORE.save()
+    return len(BOOKING_STORE)
 
-    BOOKING_STORE.metadata = []
-    BOOKING_STORE.embeddings = np.zeros((0, EMBEDDING_DIM))
 
-    for b in bookings:
-        text = f"Booking ID {b.get('booking_id')} for Customer {b.get('booking_customer_id')}"
-        BOOKING_STORE.add(str(b.get("booking_id", "0")), text)
+# Tables that support incremental sync: store -> where its rows come from.
+SYNC_SOURCES = {
+    "customers": {
+        "store": CUSTOMER_STORE,
+        "table": "customer",
+        "id_column": "customer_id",
+        "columns": ["customer_id", "customer_name", "email", "company_id"],
+        "to_text": customer_text,
+        "build": build_customer_rag,
+    },
+    "bookings": {
+        "store": BOOKING_STORE,
+        "table": "booking",
+        "id_column": "booking_id",
+        "columns": ["booking_id", "booking_customer_id", "company_id"],
+        "to_text": booking_text,
+        "build": build_booking_rag,
+    },
+}
 
-    BOOKING_STORE.save()
-    return len(BOOKING_STORE.metadata)
 
+def _source_hash(*parts):
+    """Digest of what a catalog store is built from, embedder included."""
+    payload = json.dumps([EMBEDDER_NAME, *parts], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
-def build_room_type_rag():
+
+def _unchanged(store, digest):
+    if store.sync_state.get("source_hash") != digest:
+        return False
+    print(f"[RAG SYNC] {store.name}: source unchanged, snapshot v{store.version} kept")
+    return True
+
+
+def build_room_type_rag(progress=None, if_changed=False):
     from services_pms import get_room_types
 
     rooms = get_room_types() or []
+    ids = [str(r.get("id", "0")) for r in rooms]
+    texts = [
+        f"{r.get('name', '')} - {r.get('description', '')} - Max occupancy: {r.get('max_occupancy', 2)} - Base price: ${r.get('base_price', 100)}"
+        for r in rooms
+    ]
+    digest = _source_hash(ids, texts)
 
-    ROOM_TYPE_STORE.metadata = []
-    ROOM_TYPE_STORE.embeddings = np.zeros((0, EMBEDDING_DIM))
+    with ROOM_TYPE_STORE.write_lock:
+        if if_changed and _unchanged(ROOM_TYPE_STORE, digest):
+            return len(ROOM_TYPE_STORE)
+        ROOM_TYPE_STORE.clear()
+        ROOM_TYPE_STORE.sync_state = {"source_hash": digest}
 
-    for r in rooms:
-        text = f"{r.get('name', '')} - {r.get('description', '')} - Max occupancy: {r.get('max_occupancy', 2)} - Base price: ${r.get('base_price', 100)}"
-        ROOM_TYPE_STORE.add(str(r.get("id", "0")), text)
+        if progress is not None:
+            progress.expected = len(rooms)
+        added = ROOM_TYPE_STORE.add_many(ids, texts)
+        if progress is not None:
+            progress.advance(added)
 
-    ROOM_TYPE_STORE.save()
-    return len(ROOM_TYPE_STORE.metadata)
+        ROOM_TYPE_STORE.build_index()
+        ROOM_TYPE_STORE.save()
+    return len(ROOM_TYPE_STORE)
 
 
-def build_hotel_info_rag():
+def build_hotel_info_rag(progress=None, if_changed=False):
     file_path = Path("data/hotel_info.txt")
     if not file_path.exists():
         return 0
@@ -165,41 +1427,254 @@ def build_hotel_info_rag():
         print(f"Error reading hotel info: {e}")
         return 0
 
-    HOTEL_INFO_STORE.metadata = []
-    HOTEL_INFO_STORE.embeddings = np.zeros((0, EMBEDDING_DIM))
+    # Sections (=== SECTION ===) are cut into token-bounded chunks; Q/A pairs stay whole.
+    chunks, _ = chunk_document(content, HOTEL_INFO_CHUNK_TOKENS, HOTEL_INFO_CHUNK_OVERLAP)
+    ids = [c["id"] for c in chunks]
+    texts = [c["text"] for c in chunks]
+    digest = _source_hash(content, HOTEL_INFO_CHUNK_TOKENS, HOTEL_INFO_CHUNK_OVERLAP)
 
-    # Split by sections (=== SECTION ===)
-    import re
-    sections = re.split(r'(=== .+ ===)', content)
-    
-    current_section = "General Info"
-    
-    for i in range(len(sections)):
-        part = sections[i].strip()
-        if not part:
-            continue
-            
-        if part.startswith("===") and part.endswith("==="):
-            current_section = part.replace("===", "").strip()
-        else:
-            # This is the content
-            text = f"[{current_section}]\n{part}"
-            # Use section name as ID for simplicity, or just an index
-            doc_id = f"info_{i}"
-            HOTEL_INFO_STORE.add(doc_id, text)
+    with HOTEL_INFO_STORE.write_lock:
+        if if_changed and _unchanged(HOTEL_INFO_STORE, digest):
+            return len(HOTEL_INFO_STORE)
+        HOTEL_INFO_STORE.clear()
+        HOTEL_INFO_STORE.sync_state = {"source_hash": digest}
+        if progress is not None:
+            progress.expected = len(texts)
+        added = HOTEL_INFO_STORE.add_many(ids, texts)
+        if progress is not None:
+            progress.advance(added)
+
+        HOTEL_INFO_STORE.build_index()
+        HOTEL_INFO_STORE.save()
+    return len(HOTEL_INFO_STORE)
+
+
+def expand_hotel_info(hits, snapshot=None, max_tokens=HOTEL_INFO_CONTEXT_TOKENS):
+    """
+    Context texts for hotel_info search hits, at most `max_tokens` in total.
+
+    Hits are taken in rank order while they fit; then each kept hit is grown
+    by the chunks right before and after it in its section, budget permitting.
+    Chunks of one section are merged into one text. Neighbours are read from
+    `snapshot` (default: the published one), the snapshot the hits came from.
+    """
+    snapshot = snapshot or HOTEL_INFO_STORE.snapshot
+    texts = {}  # chunk id -> text, in the order chosen
+
+    def render(chosen):
+        groups = {}
+        for chunk_id in chosen:
+            groups.setdefault(parent_id(chunk_id), []).append(chunk_id)
+        return [
+            merge_chunks([chosen[c] for c in sorted(ids, key=lambda c: chunk_position(c)[1] or 0)])
+            for ids in groups.values()
+        ]
+
+    def try_add(chunk_id, text):
+        if chunk_id in texts or text is None:
+            return
+        candidate = {**texts, chunk_id: text}
+        # The best hit is always given, even alone over the budget.
+        if not texts or count_tokens("\n".join(render(candidate))) <= max_tokens:
+            texts[chunk_id] = text
+
+    for hit in hits:
+        try_add(hit["id"], hit["text"])
+    for hit in [h for h in hits if h["id"] in texts]:
+        for neighbour in neighbour_ids(hit["id"]):
+            try_add(neighbour, snapshot.text(neighbour))
+    return render(texts)
 
-    HOTEL_INFO_STORE.save()
-    return len(HOTEL_INFO_STORE.metadata)
 
+BUILDERS = {
+    "customers": (CUSTOMER_STORE, build_customer_rag),
+    "bookings": (BOOKING_STORE, build_booking_rag),
+    "room_types": (ROOM_TYPE_STORE, build_room_type_rag),
+    "hotel_info": (HOTEL_INFO_STORE, build_hotel_info_rag),
+}
 
-def build_all_rag():
+
+def _run_build(name, progress):
+    store, build = BUILDERS[name]
+    try:
+        build(progress)
+    except Exception as e:
+        print(f"[RAG BUILD] {name} failed: {e}")
+        # Nothing was saved; drop the half-built working copy.
+        store.reload()
+        return {**progress.report(), "error": str(e)}
+    progress.finish()
+    report = progress.report()
+    print(f"[RAG BUILD] {name}: {report}")
+    return report
+
+
+@contextmanager
+def sync_lock():
+    """
+    Hold RAG_FOLDER/sync.lock for a whole rebuild or sync.
+
+    SyncJobManager runs one job at a time per process; this lock extends that
+    to every process sharing RAG_FOLDER (gunicorn workers, __main__), and the
+    stores catch up with whatever the previous holder saved before writing.
+    """
     os.makedirs(RAG_FOLDER, exist_ok=True)
+    with open(Path(RAG_FOLDER) / "sync.lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            for store, _ in BUILDERS.values():
+                store.catch_up()
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def build_all_rag(workers=RAG_BUILD_WORKERS, progress=None):
+    """
+    Rebuild every store from scratch, running the builders in a thread pool.
+    Returns {store: {"rows", "elapsed_s", "rows_per_sec", "peak_rss_mb", ...}};
+    a store whose build failed keeps its previous snapshot and reports "error".
+    Pass a dict as `progress` to watch the per-store BuildProgress while it runs.
+    """
+    progress = {} if progress is None else progress
+    for name in BUILDERS:
+        progress[name] = BuildProgress(name)
+
+    with sync_lock(), ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rag-build") as pool:
+        futures = {name: pool.submit(_run_build, name, progress[name]) for name in BUILDERS}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def sync_store(name, progress=None):
+    """
+    Incrementally bring one SYNC_SOURCES store up to date with its table.
+
+    Only rows past the stored high-water mark (or, when an update column is
+    configured in RAG_SYNC_UPDATED_COLUMN, changed since the last sync) are
+    embedded. Rows that became is_deleted = 1 are tombstoned, and the store is
+    compacted once tombstones pass RAG_COMPACT_RATIO; otherwise its IVF index
+    is retrained once the rows added since training pass ANN_RETRAIN_RATIO.
+    Falls back to a full rebuild when the store has never been synced or was
+    built by another embedder.
+    """
+    from services_pms import execute_query
+
+    source = SYNC_SOURCES[name]
+    store = source["store"]
+    state = store.sync_state
+
+    # Never synced, or built by a different embedder: its vectors can't be mixed with new ones.
+    if "high_water" not in state or state.get("embedder") != EMBEDDER_NAME:
+        return {"mode": "full", "rows": source["build"](progress)}
 
-    results = {
-        "customers": build_customer_rag(),
-        "bookings": build_booking_rag(),
-        "room_types": build_room_type_rag(),
-        "hotel_info": build_hotel_info_rag()
+    table = source["table"]
+    id_column = source["id_column"]
+    partition_column = store.partition_column
+    columns = list(source["columns"])
+    updated_column = RAG_SYNC_UPDATED_COLUMN.get(table)
+    high_water = state["high_water"]
+    since = state.get("updated_at")
+    deleted_count = None
+    # Built from an empty table: start the update mark now, or it never advances.
+    seed = _updated_mark(table) if updated_column and not since else None
+
+    if updated_column and since:
+        # >=: rows stamped in the same second as the mark may not have been seen yet;
+        # re-upserting the ones that were is harmless.
+        columns.append(updated_column)
+        changed = execute_query(
+            f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE is_deleted = 0 AND ({id_column} > %s OR {updated_column} >= %s)",
+            (high_water, since),
+        )
+        deleted = execute_query(
+            f"SELECT {id_column}, {partition_column} FROM {table} "
+            f"WHERE is_deleted = 1 AND {id_column} <= %s AND {updated_column} >= %s",
+            (high_water, since),
+        )
+    else:
+        changed = execute_query(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE is_deleted = 0 AND {id_column} > %s",
+            (high_water,),
+        )
+        # Without an update column, soft deletes can only be found by id. The deleted
+        # rows are only re-read when their count has moved since the last sync (an
+        # undelete and a delete in between cancel out; see RAG_SYNC_UPDATED_COLUMN).
+        deleted_count = _count_deleted(table)
+        if deleted_count is not None and deleted_count == state.get("deleted_count"):
+            deleted = []
+        else:
+            deleted = execute_query(
+                f"SELECT {id_column}, {partition_column} FROM {table} WHERE is_deleted = 1 AND {id_column} <= %s",
+                (high_water,),
+            )
+
+    if changed is None or deleted is None:
+        print(f"[RAG SYNC] {name}: query failed, store left unchanged")
+        return {"mode": "incremental", "error": "query failed"}
+
+    if progress is not None:
+        progress.expected = len(changed)
+
+    with store.write_lock:
+        removed = store.delete_rows(deleted, id_column)
+        upserted = 0
+        for start in range(0, len(changed), RAG_STREAM_CHUNK):
+            chunk = changed[start:start + RAG_STREAM_CHUNK]
+            upserted += store.upsert_rows(chunk, id_column, source["to_text"])
+            if progress is not None:
+                progress.advance(len(chunk))
+
+        if changed:
+            state["high_water"] = max(high_water, max(int(r[id_column]) for r in changed))
+            if updated_column:
+                stamps = [r[updated_column] for r in changed if r.get(updated_column) is not None]
+                if stamps:
+                    state["updated_at"] = max(str(since or ""), str(max(stamps)))
+                elif seed is not None:
+                    state["updated_at"] = seed
+
+        if deleted_count is not None:
+            state["deleted_count"] = deleted_count
+        store.sync_state = state
+
+        compacted = store.compact() if store.needs_compaction() else 0
+        # Compaction retrains the index; otherwise retrain once the unindexed tail grows too long.
+        reindexed = store.reindex()
+        # A no-op sync writes nothing: no new version, no evicted rollback point.
+        if upserted or removed or compacted or reindexed:
+            store.save()
+
+    return {
+        "mode": "incremental",
+        "upserted": upserted,
+        "deleted": removed,
+        "compacted": compacted,
+        "reindexed": reindexed,
+        "rows": len(store),
     }
 
-    return results
+
+def sync_all_rag(progress=None):
+    """
+    Incremental sync for customers/bookings; the small catalog stores are rebuilt
+    only when their source (room_types rows, hotel_info.txt) has changed.
+    Pass a dict as `progress` to watch the per-store BuildProgress while it runs.
+    """
+    progress = {} if progress is None else progress
+
+    def run(name, step):
+        progress[name] = BuildProgress(name)
+        result = step(progress[name])
+        progress[name].finish()
+        return result
+
+    with sync_lock():
+        return {
+            "customers": run("customers", lambda p: sync_store("customers", p)),
+            "bookings": run("bookings", lambda p: sync_store("bookings", p)),
+            "room_types": run("room_types", lambda p: build_room_type_rag(p, if_changed=True)),
+            "hotel_info": run("hotel_info", lambda p: build_hotel_info_rag(p, if_changed=True)),
+        }